@@ -0,0 +1,258 @@
+"""
+benchmarks of the spectrum functions and of the graph classes
+
+    python -m benchmarks.run                   runs all the benchmarks, saves benchmarks/results/<commit>.json
+    python -m benchmarks.run --quick           skips the 200000 points grid
+    python -m benchmarks.run --filter border   runs the benchmarks whose name contains 'border'
+    python -m benchmarks.run --compare HEAD~1  compares to the results saved for another commit
+    python -m benchmarks.run --backend numpy   computes the graphs with a given kernel backend (modules.backends)
+
+the caches of the graphs (components, doppler kernels) are cleared before each call, so the timings are the timings of
+a redraw with new inputs. The difference between the analytic and the FFT convolution of the temperature graph is
+saved with the timings (cross-check of both methods on each grid), with the truncation error of the doppler kernel of
+the FFT convolution
+"""
+from typing import Callable, Dict, List, Optional
+import argparse
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import time
+import numpy as np
+from modules.functions import inelastic_intensity, inelastic_intensity_array, doppler_broadened_spectrum, \
+    doppler_broadened_spectrum_array
+from modules.graph_classes import NumbersGraph, InelasticIntensity, DopplerBroadenedSpectrum, \
+    ElasticInelasticTemperatureIntensity
+from modules.backends import BACKENDS, available_backends, set_backend
+
+RESULTS_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+GRIDS = (200, 2000, 20000, 200000)
+RANDOM_RESOLUTIONS = (10, 30, 100)
+# scalar functions are only measured on the small grids (python loop)
+SCALAR_GRIDS = (200, 2000)
+INPUTS = {
+    'saturation_parameter': 3.0,
+    'detuning': 1.0,
+    'gamma': 1.0,
+    'angle': 90.0,
+    'temperature': 100.0,
+    'saturation_intensity': 1.669,
+    'laser_intensity_error_mu': 0.0,
+    'laser_intensity_error_sigma': 0.1,
+    'laser_intensity_error_uniform': 0.0,
+    'laser_intensity_error_seed': 0,
+}
+
+
+def clear_caches() -> None:
+    """
+    empties the caches shared by the graphs
+    """
+    NumbersGraph.components.clear()
+    with DopplerBroadenedSpectrum.kernel_cache.lock:
+        DopplerBroadenedSpectrum.kernel_cache.kernels.clear()
+
+
+def measure(function: Callable[[], object], repeat: int = 5, min_time: float = 0.05) -> Dict[str, float]:
+    """
+    times a function (the caches are cleared before each call, outside of the timing)
+    :param function: function without arguments
+    :param repeat: number of measures
+    :param min_time: minimum duration in seconds of a measure (the function is called several times if it is fast)
+    :return: minimum, median and maximum time of a call in seconds, number of calls per measure
+    """
+    # warm up (lazy imports, first allocations)
+    timed_calls(function, 1)
+    number = 1
+    while True:
+        duration = timed_calls(function, number)
+        if duration >= min_time or number >= 2 ** 20:
+            break
+        number *= 2 if duration == 0 else max(2, min(10, math.ceil(min_time / duration)))
+    timings = [duration / number] + [timed_calls(function, number) / number for _ in range(repeat - 1)]
+    return {'min': min(timings), 'median': statistics.median(timings), 'max': max(timings), 'number': number}
+
+
+def timed_calls(function: Callable[[], object], number: int) -> float:
+    """
+    :param function: function without arguments
+    :param number: number of calls
+    :return: total time in seconds of the calls
+    """
+    total = 0.0
+    for _ in range(number):
+        clear_caches()
+        start = time.perf_counter()
+        function()
+        total += time.perf_counter() - start
+    return total
+
+
+def benchmarks(grids=GRIDS, random_resolutions=RANDOM_RESOLUTIONS) -> Dict[str, Callable[[], object]]:
+    """
+    :param grids: numbers of points of the grids
+    :param random_resolutions: numbers of realisations of the intensity error
+    :return: dictionary name of the benchmark -> function without arguments
+    """
+    cases = {}
+    s, detuning, gamma, saturation_intensity = (INPUTS[name] for name in (
+        'saturation_parameter', 'detuning', 'gamma', 'saturation_intensity'))
+    temperature, angle = INPUTS['temperature'] * 10 ** -6, math.radians(INPUTS['angle'])
+    for points in grids:
+        x_values = np.linspace(-10, 10, points)
+        if points in SCALAR_GRIDS:
+            cases[f'inelastic_intensity[{points}]'] = lambda x=x_values: [
+                inelastic_intensity(w, s, detuning, gamma, saturation_intensity, 0) for w in x]
+            cases[f'doppler_broadened_spectrum[{points}]'] = lambda x=x_values: [
+                doppler_broadened_spectrum(w, detuning, temperature, angle) for w in x]
+        cases[f'inelastic_intensity_array[{points}]'] = lambda x=x_values: inelastic_intensity_array(
+            x, s, detuning, gamma, saturation_intensity)
+        cases[f'doppler_broadened_spectrum_array[{points}]'] = lambda x=x_values: doppler_broadened_spectrum_array(
+            x, detuning, temperature, angle)
+        errors = np.random.default_rng(0).normal(0, INPUTS['laser_intensity_error_sigma'], RANDOM_RESOLUTIONS[1])
+        for name in available_backends():
+            if name == 'scalar' and points not in SCALAR_GRIDS:
+                continue
+            backend = BACKENDS[name]()
+            cases[f'backend[{name}].inelastic_intensity[{points}]'] = lambda x=x_values, b=backend: \
+                b.inelastic_intensity(x, s, detuning, gamma, saturation_intensity)
+            cases[f'backend[{name}].inelastic_intensity[{points},{len(errors)}]'] = lambda x=x_values, b=backend: \
+                b.inelastic_intensity(x, s, detuning, gamma, saturation_intensity, errors)
+            cases[f'backend[{name}].doppler_broadened_spectrum[{points}]'] = lambda x=x_values, b=backend: \
+                b.doppler_broadened_spectrum(x, detuning, temperature, angle)
+
+    cases['InelasticIntensity.find_border'] = lambda: InelasticIntensity().find_border(dict(INPUTS, offset=0.0))
+    for points in grids:
+        for method in ('fft', 'analytic'):
+            inputs = dict(INPUTS, temperature_resolution=points, convolution_method=method)
+            cases[f'ElasticInelasticTemperatureIntensity.update[{method},{points}]'] = \
+                lambda inputs=inputs: ElasticInelasticTemperatureIntensity().update(inputs)
+            for random_resolution in random_resolutions:
+                random_inputs = dict(inputs, laser_intensity_error_random_resolution=random_resolution)
+                cases[f'ElasticInelasticTemperatureIntensity.update_with_random[{method},{points},'
+                      f'{random_resolution}]'] = \
+                    lambda inputs=random_inputs: ElasticInelasticTemperatureIntensity().update_with_random(inputs)
+    return cases
+
+
+def convolution_differences(grids=GRIDS) -> Dict[str, Callable[[], float]]:
+    """
+    cross-check of the analytic convolution of the temperature graph against the FFT convolution
+    :param grids: numbers of points of the grids
+    :return: dictionary name of the check -> function returning the maximum difference between both methods relative
+    to the maximum of the FFT graph
+    """
+    return {f'ElasticInelasticTemperatureIntensity.convolution_difference[{points}]':
+            lambda inputs=dict(INPUTS, temperature_resolution=points):
+            ElasticInelasticTemperatureIntensity().convolution_difference(inputs)
+            for points in grids}
+
+
+def truncation_errors(grids=GRIDS) -> Dict[str, Callable[[], float]]:
+    """
+    truncation error of the doppler kernel of the FFT convolution of the temperature graph
+    :param grids: numbers of points of the grids
+    :return: dictionary name of the check -> function returning the part of the kernel removed by its truncation
+    """
+    def truncation_error(inputs):
+        graph = ElasticInelasticTemperatureIntensity()
+        graph.update(inputs)
+        return graph.truncation_error
+
+    return {f'ElasticInelasticTemperatureIntensity.truncation_error[{points}]':
+            lambda inputs=dict(INPUTS, temperature_resolution=points, convolution_method='fft'):
+            truncation_error(inputs)
+            for points in grids}
+
+
+def commit() -> str:
+    """
+    :return: short hash of the current commit ('unknown' outside of a git repository)
+    """
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(results: Dict[str, Dict[str, float]], reference: Dict[str, Dict[str, float]]) -> List[str]:
+    """
+    :param results: new results
+    :param reference: results of another commit
+    :return: one line per benchmark present in both: reference and new median times, ratio new / reference
+    """
+    lines = []
+    for name, timing in results.items():
+        if name in reference:
+            old, new = reference[name]['median'], timing['median']
+            lines.append(f'{name:<72}{old * 1000:11.3f} ms {new * 1000:11.3f} ms {new / old:7.2f}x')
+    return lines
+
+
+def main(arguments: Optional[List[str]] = None) -> None:
+    """
+    command line entry point
+    :param arguments: command line arguments (default: sys.argv)
+    """
+    parser = argparse.ArgumentParser(description='benchmarks of the spectrum functions and of the graph classes')
+    parser.add_argument('--quick', action='store_true', help='skips the largest grid')
+    parser.add_argument('--filter', default='', help='runs the benchmarks whose name contains this text')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--compare', default=None, help='commit whose saved results are compared to the new ones')
+    parser.add_argument('--output', default=None, help='results file (default: benchmarks/results/<commit>.json)')
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default=None,
+                        help='kernel backend of the graphs (default: automatic choice)')
+    arguments = parser.parse_args(arguments)
+    print(f'kernel backend of the graphs: {set_backend(arguments.backend).name}')
+
+    reference = None
+    if arguments.compare is not None:
+        reference_revision = subprocess.run(['git', 'rev-parse', '--short', arguments.compare], capture_output=True,
+                                            text=True).stdout.strip() or arguments.compare
+        with open(os.path.join(RESULTS_DIRECTORY, reference_revision + '.json'), 'r') as f:
+            reference = json.load(f)['results']
+
+    cases = benchmarks(GRIDS[:-1] if arguments.quick else GRIDS)
+    results = {}
+    for name, function in cases.items():
+        if arguments.filter in name:
+            results[name] = measure(function, arguments.repeat)
+            print(f'{name:<72}{results[name]["median"] * 1000:11.3f} ms')
+    differences = {}
+    for name, function in convolution_differences(GRIDS[:-1] if arguments.quick else GRIDS).items():
+        if arguments.filter in name:
+            differences[name] = function()
+            print(f'{name:<72}{differences[name]:14.3g}')
+    errors = {}
+    for name, function in truncation_errors(GRIDS[:-1] if arguments.quick else GRIDS).items():
+        if arguments.filter in name:
+            errors[name] = function()
+            print(f'{name:<72}{errors[name]:14.3g}')
+
+    revision = commit()
+    output = arguments.output or os.path.join(RESULTS_DIRECTORY, revision + '.json')
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    # results of previous runs on the same commit (other benchmarks) are kept
+    saved = {}
+    if os.path.exists(output):
+        with open(output, 'r') as f:
+            saved = json.load(f)
+    with open(output, 'w') as f:
+        json.dump({'commit': revision, 'python': platform.python_version(), 'numpy': np.__version__,
+                   'machine': platform.machine(), 'results': dict(saved.get('results', {}), **results),
+                   'convolution_differences': dict(saved.get('convolution_differences', {}), **differences),
+                   'truncation_errors': dict(saved.get('truncation_errors', {}), **errors)},
+                  f, indent=2)
+    print(f'results saved to {output}')
+
+    if reference is not None:
+        print(f'\n{"benchmark":<72}{reference_revision:>14} {revision:>14}')
+        print('\n'.join(compare(results, reference)))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,24 +1,52 @@
+import time
+
+START_TIME = time.perf_counter()
 from typing import Any, Union, Dict
 import math
-from modules.auto_installer import install
+import sys
+from modules.startup import StartupProfile
+from modules.auto_installer import check_dependencies
+
+STARTUP_PROFILE = StartupProfile(START_TIME)
+
+if __name__ == '__main__' and ('--check-dependencies' in sys.argv or '--install-dependencies' in sys.argv):
+    # only checks that the packages can be imported, pip is only called with --install-dependencies
+    MISSING_PACKAGES = check_dependencies(install_missing='--install-dependencies' in sys.argv)
+    if MISSING_PACKAGES or '--check-dependencies' in sys.argv:
+        sys.exit(1 if MISSING_PACKAGES else 0)
 from modules.main_window import Ui_MainWindow
 from PyQt5 import QtCore, QtGui
 from PyQt5 import QtWidgets
-from modules.graph_classes import InelasticIntensity, laser_intensity_from_laser_waist_laser_power, \
-    saturation_parameter_from_laser_intensity, ElasticIntensity, Intensity, NumbersGraph, \
-    saturation_parameter_from_rabi_frequency, rabi_frequency_from_saturation_parameter, generalised_rabi_frequency, \
+
+STARTUP_PROFILE.mark('import PyQt5 and matplotlib widget')
+# scipy is only imported by the first doppler broadened computation
+from modules.graph_classes import InelasticIntensity, ElasticIntensity, Intensity, generalised_rabi_frequency, \
     ElasticInelasticTemperatureIntensity, DopplerBroadenedSpectrum
+from modules.parameters import GraphParameters, DEFAULTS
+from modules.workers import GraphWorker
+from modules.result_cache import ResultCache
+from modules.spectrum_store import SpectrumStore
+from modules.theme_cache import theme_colors
+from modules.backends import kernel_backend
+
+STARTUP_PROFILE.mark('import graphs (numpy)')
 from matplotlib.backends.backend_qt5agg import (NavigationToolbar2QT as NavigationToolbar)
-from qt_material import apply_stylesheet
 import matplotlib as mpl
-from bs4 import BeautifulSoup
 
-install()  # empty
+STARTUP_PROFILE.mark('import matplotlib backend')
+from qt_material import apply_stylesheet
+
+STARTUP_PROFILE.mark('import qt_material')
 
 
 class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
     inputs: Dict[Union[str, Any], Union[Union[str, float, int], Any]]
     resized = QtCore.pyqtSignal()
+    # delay in ms during which update requests are merged into one update (one frame)
+    update_delay: int = 16
+    # resolution and number of intensity error realisations of the preview shown while a slider is dragged
+    preview_resolution: int = 500
+    preview_random_resolution: int = 8
 
     def __init__(self, color_dict, *args, **kwargs):
         """
@@ -39,8 +67,34 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         self.graphs_to_update = []
         self.toolbar = NavigationToolbar(self.MplWidget.canvas, self)
         self.addToolBar(self.toolbar)
+        # spectra loaded from a sweep store, drawn with the computed graphs
+        self.stored_spectra = []
+        self.toolbar.addAction('Open spectra', self.open_spectra)
+        self.toolbar.addAction('Clear spectra', self.clear_spectra)
         self.scrollArea.setMinimumWidth(500)
 
+        # computations are done outside of the GUI thread, one request at a time
+        self.thread_pool = QtCore.QThreadPool(self)
+        self.thread_pool.setMaxThreadCount(1)
+        self.worker = None
+        self.generation = 0
+        # values of the graphs already computed, keyed by their inputs
+        self.result_cache = ResultCache()
+        # last drawn results and the inputs they were computed with
+        self.last_results = None
+        self.last_parameters = None
+        # resolution and span of the graphs set by the sliders, parameters of the graphs made by handle_inputs
+        self.graph_resolution = DEFAULTS['resolution']
+        self.graph_span = DEFAULTS['span']
+        self.parameters = None
+
+        # bursts of update requests are merged into one update per frame
+        self.update_timer = QtCore.QTimer(self)
+        self.update_timer.setSingleShot(True)
+        self.update_timer.setInterval(self.update_delay)
+        self.update_timer.timeout.connect(self.update_graph)
+        self.preview_update = False
+
         # defining line inputs
         self.inputs = {
             'saturation_parameter': "",
@@ -57,6 +111,10 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
             'laser_intensity_error_sigma': 0,
             'laser_intensity_error_uniform': 0,
             'laser_intensity_error_random_resolution': 30,
+            'laser_intensity_error_quadrature_order': 4,
+            'laser_intensity_error_averaging': 'monte_carlo',
+            'convolution_method': 'fft',
+            'adaptive_grid': False,
         }
         self.inputs_objects = {
             'saturation_parameter': self.saturation_parameter_line_edit,
@@ -71,23 +129,30 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
             'laser_intensity_error_mu': self.laser_intensity_error_mu_line_edit,
             'laser_intensity_error_sigma': self.laser_intensity_error_sigma_line_edit,
             'laser_intensity_error_uniform': self.laser_intensity_error_uniform_line_edit,
-            'laser_intensity_error_random_resolution': self.laser_intensity_resolution_random_line_edit
+            'laser_intensity_error_random_resolution': self.laser_intensity_resolution_random_line_edit,
+            'laser_intensity_error_quadrature_order': self.laser_intensity_error_quadrature_order_line_edit
         }
 
         # connecting events
         for key, item in self.inputs_objects.items():
             item.setText(str(self.inputs[key]))
             item.textChanged.connect(self.handle_inputs_visibility)
-        self.update_graph_button.clicked.connect(self.update_graph)
+        self.update_graph_button.clicked.connect(self.request_update)
         self.graphic_resolution_slider.valueChanged.connect(self.update_resolution)
         self.graph_span_slider.valueChanged.connect(self.update_graph_span)
-        self.show_inelastic_intensity.stateChanged.connect(self.update_graph)
-        self.show_elastic_intensity.stateChanged.connect(self.update_graph)
-        self.show_elastic_inelastic_intensity.stateChanged.connect(self.update_graph)
-        self.show_annotations_input.stateChanged.connect(self.update_graph)
-        self.center_on_detuning_input.stateChanged.connect(self.update_graph)
-        self.show_elastic_inelastic_temperature_intensity.stateChanged.connect(self.update_graph)
-        self.convolution_kernel.stateChanged.connect(self.update_graph)
+        self.graphic_resolution_slider.sliderReleased.connect(self.request_update)
+        self.graph_span_slider.sliderReleased.connect(self.request_update)
+        self.show_inelastic_intensity.stateChanged.connect(self.request_update)
+        self.show_elastic_intensity.stateChanged.connect(self.request_update)
+        self.show_elastic_inelastic_intensity.stateChanged.connect(self.request_update)
+        # the annotations do not change the values of the graphs
+        self.show_annotations_input.stateChanged.connect(self.redraw_graph)
+        self.center_on_detuning_input.stateChanged.connect(self.request_update)
+        self.show_elastic_inelastic_temperature_intensity.stateChanged.connect(self.request_update)
+        self.convolution_kernel.stateChanged.connect(self.request_update)
+        self.quadrature_averaging_input.stateChanged.connect(self.request_update)
+        self.analytic_convolution_input.stateChanged.connect(self.request_update)
+        self.adaptive_grid_input.stateChanged.connect(self.request_update)
 
         self.handle_inputs()
         self.update_graph()
@@ -106,7 +171,7 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         :param event:
         """
         if event.key() == QtCore.Qt.Key_Return:
-            self.update_graph()
+            self.request_update()
         else:
             super().keyPressEvent(event)
 
@@ -124,15 +189,34 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         """
         update the resolution of the graphs
         """
-        NumbersGraph.resolution = self.graphic_resolution_slider.value()
-        self.update_graph()
+        self.graph_resolution = self.graphic_resolution_slider.value()
+        self.schedule_update(preview=self.graphic_resolution_slider.isSliderDown())
 
     def update_graph_span(self):
         """
         update the span of the graphs
         """
-        NumbersGraph.span = math.exp(self.graph_span_slider.value() / 10) / 10
-        self.update_graph()
+        self.graph_span = math.exp(self.graph_span_slider.value() / 10) / 10
+        self.schedule_update(preview=self.graph_span_slider.isSliderDown())
+
+    def schedule_update(self, preview=False):
+        """
+        merges bursts of update requests into one update of the graphs at the next frame, the timer is not restarted
+        so a continuous drag still updates the graphs once per frame
+        :param preview: cheap low resolution update (while a slider is dragged)
+        """
+        if self.update_timer.isActive():
+            # a full resolution request (slider released) upgrades the pending preview
+            self.preview_update = self.preview_update and preview
+            return
+        self.preview_update = preview
+        self.update_timer.start()
+
+    def request_update(self):
+        """
+        full resolution update of the graphs at the next frame
+        """
+        self.schedule_update()
 
     def handle_inputs_visibility(self):
         """
@@ -144,13 +228,14 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         if self.rabi_frequency_line_edit.text() != "":
             for key, item in self.inputs_objects.items():
                 if key not in ['rabi_frequency', 'detuning', 'angle', 'temperature', 'laser_intensity_error_mu',
-                               'laser_intensity_error_sigma', 'laser_intensity_error_uniform']:
+                               'laser_intensity_error_sigma', 'laser_intensity_error_uniform',
+                               'laser_intensity_error_quadrature_order']:
                     item.setEnabled(False)
         elif self.saturation_parameter_line_edit.text() != "":
             for key, item in self.inputs_objects.items():
                 if key not in ['saturation_parameter', 'detuning', 'angle', 'temperature',
                                'laser_intensity_error_mu', 'laser_intensity_error_sigma',
-                               'laser_intensity_error_uniform']:
+                               'laser_intensity_error_uniform', 'laser_intensity_error_quadrature_order']:
                     item.setEnabled(False)
         elif self.laser_intensity_line_edit.text() != "":
             self.inputs_objects['laser_power'].setEnabled(False)
@@ -162,7 +247,8 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
 
     def handle_inputs(self):
         """
-        updates the inputs by filling them where needed
+        updates the inputs by filling them where needed and makes the parameters of the graphs
+        :raise ValueError: if an input is missing or not valid
         """
         self.handle_inputs_visibility()
         if self.laser_intensity_error_mu_line_edit.text() != "":
@@ -189,46 +275,38 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
             self.inputs['laser_intensity_error_random_resolution'] = 0
             self.inputs_objects['laser_intensity_error_random_resolution'].setText('0')
 
+        if self.laser_intensity_error_quadrature_order_line_edit.text() != "":
+            self.inputs['laser_intensity_error_quadrature_order'] = int(float(
+                self.laser_intensity_error_quadrature_order_line_edit.text()))
+        else:
+            self.inputs['laser_intensity_error_quadrature_order'] = 4
+            self.inputs_objects['laser_intensity_error_quadrature_order'].setText('4')
+        self.inputs['laser_intensity_error_averaging'] = 'quadrature' if self.quadrature_averaging_input.isChecked() \
+            else 'monte_carlo'
+        self.inputs['convolution_method'] = 'analytic' if self.analytic_convolution_input.isChecked() else 'fft'
+        self.inputs['adaptive_grid'] = self.adaptive_grid_input.isChecked()
+
+        # the saturation parameter, the rabi frequency and the laser intensity are derived from the first filled input
         if self.rabi_frequency_line_edit.text() != "":
             self.inputs['rabi_frequency'] = float(self.rabi_frequency_line_edit.text())
-            self.inputs['saturation_parameter'] = saturation_parameter_from_rabi_frequency(
-                self.inputs['rabi_frequency'])
-            self.saturation_parameter_line_edit.setPlaceholderText(str(self.inputs['saturation_parameter']))
-            self.inputs['laser_intensity'] = self.inputs['saturation_parameter'] * self.inputs['saturation_intensity']
-            self.laser_intensity_line_edit.setPlaceholderText(str(self.inputs['laser_intensity']))
-            self.laser_intensity_line_edit.setText('')
+            source = {'rabi_frequency': self.inputs['rabi_frequency']}
+        elif self.saturation_parameter_line_edit.text() != "":
+            self.inputs['saturation_parameter'] = float(self.saturation_parameter_line_edit.text())
+            source = {'saturation_parameter': self.inputs['saturation_parameter']}
+        elif self.laser_intensity_line_edit.text() != "":
+            self.inputs['laser_intensity'] = float(self.laser_intensity_line_edit.text())
+            source = {'laser_intensity': self.inputs['laser_intensity']}
         else:
-            if self.saturation_parameter_line_edit.text() != "":
-                self.inputs['saturation_parameter'] = float(self.saturation_parameter_line_edit.text())
-                self.inputs['laser_intensity'] = self.inputs['saturation_parameter'] * self.inputs[
-                    'saturation_intensity']
-                self.laser_intensity_line_edit.setPlaceholderText(str(self.inputs['laser_intensity']))
-                self.laser_intensity_line_edit.setText('')
+            self.inputs['saturation_intensity'] = float(self.saturation_i_line_edit.text())
+            if self.laser_power_line_edit.text() != "":
+                self.inputs['laser_power'] = float(self.laser_power_line_edit.text())
             else:
-
-                if self.laser_intensity_line_edit.text() != "":
-                    self.inputs['laser_intensity'] = float(self.laser_intensity_line_edit.text())
-
-                else:
-                    self.inputs['saturation_intensity'] = float(self.saturation_i_line_edit.text())
-                    if self.laser_power_line_edit.text() != "":
-                        self.inputs['laser_power'] = float(self.laser_power_line_edit.text())
-                    else:
-                        raise ValueError("laser Power must be defined to calculate the laser Intensity")
-                    if self.laser_waist_line_edit.text() != "":
-                        self.inputs['laser_waist'] = float(self.laser_waist_line_edit.text())
-                    else:
-                        raise ValueError("laser waist must be defined to calculate the laser Intensity")
-                    self.inputs['laser_intensity'] = laser_intensity_from_laser_waist_laser_power(
-                        self.inputs["laser_waist"], self.inputs['laser_power'])
-                    self.laser_intensity_line_edit.setPlaceholderText(str(self.inputs['laser_intensity']))
-
-                self.inputs['saturation_parameter'] = saturation_parameter_from_laser_intensity(
-                    self.inputs['laser_intensity'], self.inputs['saturation_intensity'])
-                self.saturation_parameter_line_edit.setPlaceholderText(str(self.inputs['saturation_parameter']))
-            self.inputs['rabi_frequency'] = rabi_frequency_from_saturation_parameter(
-                self.inputs['saturation_parameter'])
-            self.rabi_frequency_line_edit.setPlaceholderText(str(self.inputs['rabi_frequency']))
+                raise ValueError("laser Power must be defined to calculate the laser Intensity")
+            if self.laser_waist_line_edit.text() != "":
+                self.inputs['laser_waist'] = float(self.laser_waist_line_edit.text())
+            else:
+                raise ValueError("laser waist must be defined to calculate the laser Intensity")
+            source = {'laser_power': self.inputs['laser_power'], 'laser_waist': self.inputs['laser_waist']}
 
         if self.detuning_line_edit.text() != "":
             self.inputs['detuning'] = float(self.detuning_line_edit.text())
@@ -243,9 +321,29 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
                 raise ValueError("angle must be defined to draw the full graph")
             self.inputs['angle'] = float(self.angle_line_edit.text())
 
+        inputs = {name: self.inputs[name] for name in (
+            'saturation_intensity', 'detuning', 'gamma', 'temperature', 'angle', 'laser_intensity_error_mu',
+            'laser_intensity_error_sigma', 'laser_intensity_error_uniform', 'laser_intensity_error_random_resolution',
+            'laser_intensity_error_quadrature_order', 'laser_intensity_error_averaging', 'convolution_method',
+            'adaptive_grid')}
+        self.parameters = GraphParameters(
+            **source, **inputs, span=self.graph_span, resolution=self.graph_resolution,
+            offset=self.inputs['detuning'] if self.center_on_detuning_input.isChecked() else 0.0)
+
+        # derived values are shown as placeholders
+        if 'rabi_frequency' not in source:
+            self.rabi_frequency_line_edit.setPlaceholderText(str(self.parameters.rabi_frequency))
+        if 'saturation_parameter' not in source:
+            self.saturation_parameter_line_edit.setPlaceholderText(str(self.parameters.saturation_parameter))
+        if 'laser_intensity' not in source:
+            self.laser_intensity_line_edit.setPlaceholderText(str(self.parameters.laser_intensity))
+            if 'laser_power' not in source:
+                self.laser_intensity_line_edit.setText('')
+
     def update_graph(self):
         """
-        updates the graphs
+        updates the graphs: the computation is sent to the worker thread, the result of the latest request is drawn
+        by draw_graph
         :return:
         """
         # self.update_graph_span()
@@ -256,10 +354,6 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
             self.error_popup(e)
             return
 
-        if self.center_on_detuning_input.isChecked():
-            NumbersGraph.offset = self.inputs['detuning']
-        else:
-            NumbersGraph.offset = 0
         self.graphs_to_update = []
 
         if self.show_elastic_inelastic_intensity.isChecked():
@@ -272,50 +366,108 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
             self.graphs_to_update.append(self.graphs_number_objects[1])
         if self.show_elastic_inelastic_temperature_intensity.isChecked():
             self.graphs_to_update.append(self.graphs_number_objects[3])
-        self.MplWidget.canvas.axes.clear()
-        # grath styling
-        self.MplWidget.canvas.axes.grid(color='#4f5b62', linestyle='--', linewidth=0.5)
-        self.MplWidget.canvas.axes.set_title('Spectrum of light scattered by a quantum two-level system', fontsize=20,
-                                             pad=20)
-        self.MplWidget.canvas.axes.set_xlabel('$(ω - ω_{at})/Γ$')
-        self.MplWidget.canvas.axes.set_ylabel('Spectrum')
-        self.MplWidget.canvas.axes.spines['right'].set_color('#232629')
-        self.MplWidget.canvas.axes.spines['top'].set_color('#232629')
-
-        # update graphs
-        for graph in self.graphs_to_update:
-            try:
-                if self.inputs['laser_intensity_error_sigma'] != 0 or self.inputs['laser_intensity_error_mu'] != 0 or \
-                        self.inputs['laser_intensity_error_uniform'] != 0:
-                    graph.update_with_random(self.inputs)
-                else:
-                    graph.update(self.inputs)
-                self.MplWidget.canvas.axes.plot(graph.x_values, graph.y_values, label=graph.name, color=graph.color)
-            except IndexError as e:
-                print(e)
-            # self.MplWidget.canvas.axes.annotate("w_o", xy=(0, 0))
-
-            self.MplWidget.canvas.axes.legend(loc='upper right')
+
+        # the parameters are immutable: the worker can use them while new ones are made
+        parameters = self.parameters
+        preview, self.preview_update = self.preview_update, False
+        if preview:
+            parameters = parameters.replace(
+                resolution=min(parameters.resolution, self.preview_resolution),
+                temperature_resolution=self.preview_resolution,
+                laser_intensity_error_random_resolution=min(parameters.laser_intensity_error_random_resolution,
+                                                            self.preview_random_resolution))
+
+        if self.graphs_to_update:
+            # the kernel backend is chosen (numba compiled) in the GUI thread, a first compilation in a worker thread
+            # hangs
+            kernel_backend()
+
+        # only the latest request is computed and drawn
+        if self.worker is not None:
+            self.worker.cancel()
+        self.thread_pool.clear()
+        self.generation += 1
+        self.worker = GraphWorker(self.generation, self.graphs_to_update, parameters, parameters.with_random,
+                                  self.result_cache)
+        self.worker.signals.finished.connect(self.draw_graph)
+        self.thread_pool.start(self.worker)
+
+    def draw_graph(self, generation, results, parameters):
+        """
+        draws the graphs computed by the worker thread
+        :param generation: number of the request, older requests are ignored
+        :param results: values of the graphs (List[GraphResult])
+        :param parameters: parameters used to compute the graphs (GraphParameters)
+        """
+        if generation != self.generation:
+            return
+        self.last_results, self.last_parameters = results, parameters
+        self.MplWidget.update_lines(results + self.stored_spectra)
         # offset
-        if self.show_annotations_input.isChecked() and NumbersGraph.offset - NumbersGraph.span < self.inputs[
-                'detuning'] < NumbersGraph.offset + NumbersGraph.span:
-            self.MplWidget.canvas.axes.axvline(self.inputs['detuning'], ls='--',
-                                               color=self.color_dict['primaryLightColor'])
-            self.MplWidget.canvas.axes.text(self.inputs['detuning'], 0, r"$Δ/Γ$", fontsize=14,
-                                            verticalalignment='top', horizontalalignment='center',
-                                            bbox=dict(boxstyle='round',
-                                                      facecolor=self.color_dict['secondaryLightColor'], alpha=1))
+        start, end = parameters.offset - parameters.span, parameters.offset + parameters.span
+        self.MplWidget.update_annotation(
+            self.show_annotations_input.isChecked() and start < parameters.detuning < end,
+            parameters.detuning, self.color_dict['primaryLightColor'], self.color_dict['secondaryLightColor'])
         self.generalised_rabi_frequency_label.setText('Generalised Rabi Frequency(Ω<sub>G</sub>/Γ) = ' + str(
-            round(generalised_rabi_frequency(self.inputs['rabi_frequency'],
-                                             self.inputs['detuning'],
-                                             self.inputs['gamma']), 2)))
+            round(generalised_rabi_frequency(parameters.rabi_frequency, parameters.detuning, parameters.gamma), 2)))
+        truncation_errors = [result.truncation_error for result in results if result.truncation_error is not None]
+        self.truncation_error_label.setText(
+            'Doppler kernel truncation error = {:.1e}'.format(max(truncation_errors)) if truncation_errors else '')
 
         # managing limits
-        self.MplWidget.canvas.axes.set_ylim(bottom=0)
-        offset = self.inputs['detuning'] if self.center_on_detuning_input.isChecked() else 0
-        self.MplWidget.canvas.axes.set_xlim(
-            [-NumbersGraph.span + offset, NumbersGraph.span + offset])
-        self.MplWidget.canvas.draw()
+        self.MplWidget.update_limits(start, end)
+        self.MplWidget.redraw()
+
+    def redraw_graph(self):
+        """
+        draws the last results again without computing the graphs (for the display settings)
+        """
+        if self.last_results is None or self.update_timer.isActive():
+            self.request_update()
+            return
+        self.draw_graph(self.generation, self.last_results, self.last_parameters)
+
+    def open_spectra(self):
+        """
+        loads a spectrum of a sweep store (python -m modules.sweep --store) into the graph, the store is memory-mapped
+        so only the chosen row is read
+        """
+        path = QtWidgets.QFileDialog.getExistingDirectory(self, 'Open spectra')
+        if not path:
+            return
+        try:
+            store = SpectrumStore(path)
+        except (OSError, ValueError) as e:
+            self.error_popup(ValueError(str(e)))
+            return
+        rows = [store.describe(row) for row in range(store.rows) if store.written(row)]
+        if not rows:
+            return
+        row, accepted = QtWidgets.QInputDialog.getItem(self, 'Open spectra', 'Spectrum', rows, 0, False)
+        if not accepted:
+            return
+        colors = ['cyan', 'orange', 'magenta', 'lime', 'violet', 'gold']
+        self.stored_spectra.append(store.load(int(row.split(':')[0]), color=colors[len(self.stored_spectra) %
+                                                                                    len(colors)]))
+        self.redraw_graph()
+
+    def clear_spectra(self):
+        """
+        removes the spectra loaded from sweep stores
+        """
+        self.stored_spectra = []
+        self.redraw_graph()
+
+    def closeEvent(self, event):
+        """
+        stops the computations before closing
+        :param event:
+        """
+        if self.worker is not None:
+            self.worker.cancel()
+        self.thread_pool.clear()
+        self.thread_pool.waitForDone()
+        super().closeEvent(event)
 
     @staticmethod
     def error_popup(error):
@@ -329,10 +481,23 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         msg.exec_()
 
 
+def report_startup():
+    """
+    prints the startup time (and the time of each step with --profile-startup)
+    """
+    STARTUP_PROFILE.mark('first frame')
+    if '--profile-startup' in sys.argv:
+        print(STARTUP_PROFILE.report())
+    else:
+        print(f'started in {STARTUP_PROFILE.total():.2f}s')
+
+
 if __name__ == '__main__':
     app = QtWidgets.QApplication([])
+    STARTUP_PROFILE.mark('QApplication')
     THEME = 'dark_teal'
     apply_stylesheet(app, theme=f'themes/{THEME}.xml')
+    STARTUP_PROFILE.mark('stylesheet')
     font = app.font()
 
     # FACTOR on base size of the font
@@ -341,18 +506,8 @@ if __name__ == '__main__':
     app.setFont(font)
 
     # get colors from THEME
-    f = open(f'themes/{THEME}.xml', 'r')
-    colors = BeautifulSoup(f, 'xml').find_all("color")
-    f.close()
-    colors_dict = {
-        "primaryColor": colors[0].decode_contents(),
-        "primaryLightColor": colors[1].decode_contents(),
-        "secondaryColor": colors[2].decode_contents(),
-        "secondaryLightColor": colors[3].decode_contents(),
-        "secondaryDarkColor": colors[4].decode_contents(),
-        "primaryTextColor": colors[5].decode_contents(),
-        "secondaryTextColor": colors[6].decode_contents()
-    }
+    colors_dict = theme_colors(THEME)
+    STARTUP_PROFILE.mark('theme colors')
 
     # mpl setup
     mpl.rc('axes', edgecolor=colors_dict['primaryLightColor'], facecolor=colors_dict['secondaryColor'], grid=True,
@@ -376,6 +531,9 @@ if __name__ == '__main__':
     mpl.rc('figure', titlesize=BIGGER_SIZE)  # fontsize of the figure title
     mpl.rcParams["figure.autolayout"] = True  # always fit to canvas resolution
     main_window = MainWindow(colors_dict)
+    STARTUP_PROFILE.mark('main window')
     main_window.showMaximized()
+    # the first event is processed once the window is shown
+    QtCore.QTimer.singleShot(0, report_startup)
 
     app.exec_()
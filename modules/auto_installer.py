@@ -1,15 +1,65 @@
+"""
+dependency check of the app: the packages of requirements.txt are only installed when it is asked
+(python main.py --install-dependencies)
+"""
+from importlib.util import find_spec
 from subprocess import call
-import time
+from typing import List
+import sys
 
-try:
-    call(['pip', 'install', '-r', 'requirements.txt'])
-except FileNotFoundError:
+# import names of the packages whose name is not the name of the distribution
+IMPORT_NAMES = {
+    'qt-material': 'qt_material',
+}
+
+
+def requirements(path: str = 'requirements.txt') -> List[str]:
+    """
+    :param path: requirements file
+    :return: names of the required distributions
+    """
+    with open(path, 'r') as f:
+        lines = [line.split('#')[0].strip() for line in f]
+    return [line for line in lines if line]
+
+
+def missing_packages(path: str = 'requirements.txt') -> List[str]:
+    """
+    finds the required packages which can not be imported (nothing is imported)
+    :param path: requirements file
+    :return: names of the missing distributions
+    """
+    return [name for name in requirements(path) if find_spec(IMPORT_NAMES.get(name, name.replace('-', '_'))) is None]
+
+
+def install(packages: List[str]) -> bool:
+    """
+    installs packages with pip (or conda if pip is not available)
+    :param packages: names of the distributions
+    :return: True if the installation succeeded
+    """
+    if not packages:
+        return True
     try:
-        call(['conda', 'install', '-r', 'requirements.txt'])
+        return call([sys.executable, '-m', 'pip', 'install', *packages]) == 0
     except FileNotFoundError:
-        print("couldn't auto install the packages")
-        time.sleep(1)
+        try:
+            return call(['conda', 'install', '-y', *packages]) == 0
+        except FileNotFoundError:
+            print("couldn't auto install the packages")
+            return False
 
 
-def install():
-    pass
+def check_dependencies(install_missing: bool = False, path: str = 'requirements.txt') -> List[str]:
+    """
+    checks that the required packages can be imported and installs the missing ones if it is asked
+    :param install_missing: install the missing packages
+    :param path: requirements file
+    :return: names of the packages still missing
+    """
+    missing = missing_packages(path)
+    if missing and install_missing and install(missing):
+        missing = missing_packages(path)
+    if missing:
+        print('missing packages: ' + ', '.join(missing) + ' (python main.py --install-dependencies installs them)')
+    return missing
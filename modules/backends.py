@@ -0,0 +1,242 @@
+"""
+backends of the spectrum kernels of modules.functions (inelastic intensity and doppler broadened spectrum on a grid)
+
+    scalar  reference: the scalar functions of modules.functions in a python loop (slow, only used for checks)
+    numpy   broadcast arrays (modules.functions.*_array)
+    numba   fused parallel loop without temporaries, compiled on the first call (only if numba can be imported)
+
+the backend is chosen on the first call: the SPECTRUM_BACKEND environment variable if it is set, else numba if it can
+be imported and compiled, else numpy. The choice compiles (or loads from its cache) the numba kernel, it has to be made
+in the GUI thread of the app (a first compilation in a Qt worker thread hangs). python -m modules.backends checks that
+the backends agree
+"""
+from abc import ABC, abstractmethod
+from importlib.util import find_spec
+from typing import Dict, List, Optional
+import math
+import os
+import threading
+import warnings
+import numpy as np
+from modules.functions import inelastic_intensity, inelastic_intensity_array, doppler_broadened_spectrum, \
+    doppler_broadened_spectrum_array, saturation_parameter_from_laser_intensity, doppler_width
+
+# maximum difference between two backends relative to the maximum of the spectrum
+AGREEMENT_TOLERANCE = 1e-9
+
+
+class KernelBackend(ABC):
+    """kernels of the spectra evaluated on a whole grid, the subclasses only evaluate the formulas"""
+    name = 'base'
+
+    def inelastic_intensity(self, x_values, saturation_parameter, detuning, gamma, saturation_intensity,
+                            intensity_error=0.0) -> np.ndarray:
+        """
+        Calculates the inelastic intensity on a grid (same arguments as inelastic_intensity_array)
+        :param x_values: frequencies of the atom(variable), shape (n,)
+        :param saturation_parameter: saturation parameter, scalar or array of shape (m,)
+        :param detuning: detuning
+        :param gamma: default at 1
+        :param saturation_intensity: saturation intensity
+        :param intensity_error: intensity error, scalar or array of shape (m,)
+        :return: inelastic intensity, shape (n,) or (m, n) (one row per realisation)
+        """
+        # applying the intensity error on the laser intensity (one value per realisation)
+        laser_intensity = np.asarray(saturation_parameter, dtype=float) * saturation_intensity
+        laser_intensity = laser_intensity + np.asarray(intensity_error, dtype=float)
+        s = saturation_parameter_from_laser_intensity(laser_intensity, saturation_intensity)
+        y_values = self.inelastic_rows(np.asarray(x_values, dtype=float), np.atleast_1d(s), float(detuning),
+                                       float(gamma))
+        return y_values if np.ndim(s) else y_values[0]
+
+    @abstractmethod
+    def doppler_broadened_spectrum(self, x_values, laser_frequency: float, temperature: float,
+                                   angle_radians: float) -> np.ndarray:
+        """
+        Calculates the doppler broadened spectrum on a grid (same arguments as doppler_broadened_spectrum_array)
+        :param x_values: frequencies of the atom(variable)
+        :param laser_frequency: frequency of the laser
+        :param temperature: temperature in kelvin
+        :param angle_radians: angle in radians
+        :return: doppler broadened spectrum (a dirac on the laser frequency if the doppler width is 0)
+        """
+
+    def warm_up(self) -> None:
+        """
+        evaluates the kernels once on a small grid (compiles them if they are compiled on the first call)
+        """
+        self.inelastic_intensity(np.linspace(-1, 1, 8), 1.0, 0.0, 1.0, 1.0)
+
+    @abstractmethod
+    def inelastic_rows(self, w: np.ndarray, s: np.ndarray, detuning: float, gamma: float) -> np.ndarray:
+        """
+        :param w: frequencies of the atom, shape (n,)
+        :param s: saturation parameters with the intensity error, shape (m,)
+        :param detuning: detuning
+        :param gamma: default at 1
+        :return: inelastic intensity, shape (m, n)
+        """
+
+
+class ScalarBackend(KernelBackend):
+    """reference backend: one call of the scalar formula per point"""
+    name = 'scalar'
+
+    def inelastic_rows(self, w, s, detuning, gamma):
+        # the saturation intensity is 1 and the error 0: s is already the saturation parameter with the error
+        return np.array([[inelastic_intensity(float(x), float(s_i), detuning, gamma, 1.0, 0.0) for x in w]
+                         for s_i in s]).reshape(len(s), len(w))
+
+    def doppler_broadened_spectrum(self, x_values, laser_frequency, temperature, angle_radians):
+        w = np.asarray(x_values, dtype=float)
+        if doppler_width(temperature, angle_radians) == 0:
+            # the scalar formula is 0 when the width is 0, the spectra on a grid are a dirac on the laser frequency
+            return (w == laser_frequency).astype(float)
+        return np.array([doppler_broadened_spectrum(float(x), laser_frequency, temperature, angle_radians)
+                         for x in w], dtype=float)
+
+
+class NumpyBackend(KernelBackend):
+    """broadcast arrays, about a dozen temporaries of the size of the grid per call"""
+    name = 'numpy'
+
+    def inelastic_rows(self, w, s, detuning, gamma):
+        return inelastic_intensity_array(w, s, detuning, gamma, 1.0)
+
+    def doppler_broadened_spectrum(self, x_values, laser_frequency, temperature, angle_radians):
+        return doppler_broadened_spectrum_array(x_values, laser_frequency, temperature, angle_radians)
+
+
+class NumbaBackend(NumpyBackend):
+    """
+    one fused parallel loop for the inelastic intensity, the only array allocated is the result (the doppler kernel
+    is computed once per grid and cached, numpy is as fast for it). The default threading layer of numba (workqueue)
+    does not support calls from several threads at the same time: the app computes the graphs in one worker thread,
+    code calling the kernels from several threads sets NUMBA_THREADING_LAYER=omp or tbb
+    """
+    name = 'numba'
+
+    def __init__(self):
+        """
+        :raise ImportError: if numba is not installed
+        """
+        # optional dependency, only imported when the backend is used
+        from modules import numba_kernels
+        self.kernels = numba_kernels
+
+    def inelastic_rows(self, w, s, detuning, gamma):
+        out = np.empty((len(s), len(w)))
+        self.kernels.inelastic_intensity_loop(np.ascontiguousarray(w), np.ascontiguousarray(s, dtype=float), detuning,
+                                              gamma, out)
+        return out
+
+
+BACKENDS = {
+    'scalar': ScalarBackend,
+    'numpy': NumpyBackend,
+    'numba': NumbaBackend,
+}
+# backend used by the graphs (chosen by the first call of kernel_backend)
+_backend: Optional[KernelBackend] = None
+_lock = threading.Lock()
+
+
+def available_backends() -> List[str]:
+    """
+    :return: names of the backends whose dependencies can be imported (nothing is imported)
+    """
+    return [name for name in BACKENDS if name != 'numba' or find_spec('numba') is not None]
+
+
+def backend_difference(backend: KernelBackend, reference: KernelBackend) -> float:
+    """
+    evaluates both backends on a few spectra (with realisations of the intensity error, zero and large detuning)
+    :param backend: checked backend
+    :param reference: reference backend
+    :return: maximum difference between the backends relative to the maximum of each spectrum
+    """
+    x_values = np.linspace(-12, 12, 241)
+    difference = 0.0
+    for saturation_parameter, detuning, gamma in ((1.0, 0.0, 1.0), (10.0, 2.0, 1.0), (0.3, -1.5, 0.5)):
+        for intensity_error in (0.0, np.array([-0.2, 0.0, 0.35])):
+            values = [candidate.inelastic_intensity(x_values, saturation_parameter, detuning, gamma, 1.669,
+                                                    intensity_error) for candidate in (backend, reference)]
+            difference = max(difference, float(np.max(np.abs(values[0] - values[1])) / np.max(np.abs(values[1]))))
+    for temperature, angle in ((100e-6, math.pi / 2), (1e-6, math.pi / 6), (0.0, math.pi / 2)):
+        values = [candidate.doppler_broadened_spectrum(x_values / 10, 0.1, temperature, angle)
+                  for candidate in (backend, reference)]
+        difference = max(difference, float(np.max(np.abs(values[0] - values[1])) / max(np.max(values[1]), 1e-300)))
+    return difference
+
+
+def check_backends(names: Optional[List[str]] = None) -> Dict[str, float]:
+    """
+    compares the backends to the scalar reference
+    :param names: names of the checked backends (default: the available ones)
+    :return: name -> maximum relative difference to the scalar backend
+    """
+    reference = ScalarBackend()
+    return {name: backend_difference(BACKENDS[name](), reference) for name in names or available_backends()}
+
+
+def select_backend(name: Optional[str] = None) -> KernelBackend:
+    """
+    :param name: name of the backend, None: SPECTRUM_BACKEND or the fastest available backend (its kernels are
+    compiled, python -m modules.backends checks that it agrees with the other backends)
+    :return: backend
+    """
+    name = name or os.environ.get('SPECTRUM_BACKEND')
+    if name is not None:
+        if name not in BACKENDS:
+            raise ValueError(f'unknown backend {name!r}, the backends are ' + ', '.join(BACKENDS))
+        return BACKENDS[name]()
+    if 'numba' in available_backends():
+        try:
+            backend = NumbaBackend()
+            backend.warm_up()
+        except Exception as e:  # compilation errors of numba are not a single exception type
+            warnings.warn(f'numba backend not used: {e}', RuntimeWarning)
+        else:
+            return backend
+    return NumpyBackend()
+
+
+def kernel_backend() -> KernelBackend:
+    """
+    :return: backend used by the graphs (chosen on the first call)
+    """
+    global _backend
+    if _backend is None:
+        with _lock:
+            if _backend is None:
+                _backend = select_backend()
+    return _backend
+
+
+def set_backend(name: Optional[str]) -> KernelBackend:
+    """
+    changes the backend used by the graphs (the cached spectrum components are still used)
+    :param name: name of the backend (None: automatic choice)
+    :return: backend
+    """
+    global _backend
+    with _lock:
+        _backend = select_backend(name)
+    return _backend
+
+
+def main() -> None:
+    """
+    prints the difference of each available backend to the scalar reference and the automatic choice
+    """
+    failed = False
+    for name, difference in check_backends().items():
+        agrees = difference <= AGREEMENT_TOLERANCE
+        failed = failed or not agrees
+        print(f'{name:<8}{difference:10.3g}  {"ok" if agrees else "DIFFERS"}')
+    print(f'selected backend: {kernel_backend().name}')
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+spectrum components shared by the graphs: a component is computed once for the inputs it depends on
+"""
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Tuple
+import threading
+import numpy as np
+from modules.convolution import grid_key
+
+
+class ComponentStore:
+    """bounded LRU store of spectrum components, keyed by (name of the component, values of the inputs it depends on,
+    grid, intensity error)"""
+
+    def __init__(self, max_bytes: int = 128 * 2 ** 20):
+        """
+        :param max_bytes: maximum total size in bytes of the stored components
+        """
+        self.max_bytes = max_bytes
+        self.components = OrderedDict()
+        self.bytes = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(name: str, values: Tuple[Any, ...], x_values: np.ndarray, intensity_error) -> Hashable:
+        """
+        :param name: name of the component
+        :param values: values of the inputs the component depends on
+        :param x_values: grid
+        :param intensity_error: intensity error, scalar or array
+        :return: key of the component
+        """
+        intensity_error = np.asarray(intensity_error, dtype=float)
+        return name, values, grid_key(np.asarray(x_values, dtype=float)), intensity_error.shape, \
+            intensity_error.tobytes()
+
+    def get(self, name: str, values: Tuple[Any, ...], x_values: np.ndarray, intensity_error,
+            function: Callable[[np.ndarray, Any], np.ndarray], keep: bool = True) -> np.ndarray:
+        """
+        finds (or computes and stores) a component
+        :param name: name of the component
+        :param values: values of the inputs the component depends on
+        :param x_values: grid
+        :param intensity_error: intensity error, scalar or array of shape (m,)
+        :param function: computes the component from (x_values, intensity_error)
+        :param keep: the component can be asked again (False: it is only computed, e.g. for realisations of the
+        intensity error drawn without seed, which are never drawn again)
+        :return: component (read only if it is stored)
+        """
+        if not keep:
+            return np.asarray(function(x_values, intensity_error))
+        key = self.key(name, values, x_values, intensity_error)
+        with self.lock:
+            if key in self.components:
+                self.components.move_to_end(key)
+                return self.components[key]
+        component = np.asarray(function(x_values, intensity_error))
+        # components larger than an eighth of the store (blocks of random realisations) are not kept
+        if component.nbytes > self.max_bytes // 8:
+            return component
+        component.flags.writeable = False
+        with self.lock:
+            if key not in self.components:
+                self.components[key] = component
+                self.bytes += component.nbytes
+            while self.bytes > self.max_bytes:
+                _, removed = self.components.popitem(last=False)
+                self.bytes -= removed.nbytes
+        return component
+
+    def clear(self) -> None:
+        """
+        removes all the components
+        """
+        with self.lock:
+            self.components.clear()
+            self.bytes = 0
@@ -0,0 +1,251 @@
+"""
+doppler kernel and convolution of the spectra by the doppler kernel
+"""
+from collections import OrderedDict
+from typing import Optional, Tuple
+import math
+import threading
+import numpy as np
+from modules.functions import inelastic_intensity_poles, doppler_width
+from modules.backends import kernel_backend
+
+# the closed form integral of the kernel is used if the grid contains ±KERNEL_INTEGRAL_SUPPORT doppler widths
+KERNEL_INTEGRAL_SUPPORT = 8
+# kernels of at most this length are convolved directly
+DIRECT_MAX_KERNEL_LENGTH = 64
+# kernels at least this many times shorter than the signal are convolved by overlap-add
+OVERLAP_ADD_MIN_RATIO = 16
+# relative difference of the steps of a grid below which it is regular (points within a rounding error)
+REGULAR_GRID_TOLERANCE = 1e-6
+# digits of the offset of a regular grid from the detuning (in steps) kept in the key of its kernel
+KEY_OFFSET_DIGITS = 6
+
+
+def grid_key(x_values: np.ndarray) -> Tuple[int, float, float, int]:
+    """
+    :param x_values: grid
+    :return: hashable key identifying the grid
+    """
+    return len(x_values), float(x_values[0]), float(x_values[-1]), hash(x_values.tobytes())
+
+
+def kernel_key(x_values: np.ndarray, detuning: float) -> tuple:
+    """
+    the doppler kernel only depends on x - detuning: a regular grid is identified by its step, its length and the
+    offset of its start from the detuning (in steps), another grid by its values
+    :param x_values: grid of the kernel
+    :param detuning: center of the kernel (laser frequency)
+    :return: hashable key identifying the grid relative to the detuning
+    """
+    step = (x_values[-1] - x_values[0]) / max(len(x_values) - 1, 1)
+    if len(x_values) > 1 and step > 0 and np.allclose(np.diff(x_values), step, rtol=REGULAR_GRID_TOLERANCE, atol=0):
+        return len(x_values), float(step), round(float(x_values[0] - detuning) / step, KEY_OFFSET_DIGITS)
+    return detuning, grid_key(x_values)
+
+
+def fft_convolve_same(y_values: np.ndarray, kernel_fft: np.ndarray, fft_length: int, kernel_length: int) -> np.ndarray:
+    """
+    convolution of y_values by a kernel whose real FFT is already known (same output as
+    scipy.signal.convolve(y_values, kernel, mode='same'))
+    :param y_values: signal, its last axis is convolved
+    :param kernel_fft: real FFT of the kernel of length fft_length
+    :param fft_length: length of the FFT (at least len(y_values) + kernel_length - 1)
+    :param kernel_length: length of the kernel
+    :return: convolution centered on the signal
+    """
+    from scipy import fft  # imported on the first convolution (slow import)
+    start = (kernel_length - 1) // 2
+    full = fft.irfft(fft.rfft(y_values, fft_length) * kernel_fft, fft_length)
+    return full[..., start:start + np.shape(y_values)[-1]]
+
+
+def choose_convolution_method(signal_length: int, kernel_length: int) -> str:
+    """
+    :param signal_length: length of the signal
+    :param kernel_length: length of the kernel
+    :return: 'direct' for short kernels, 'overlap_add' for kernels much shorter than the signal, 'fft' otherwise
+    """
+    if kernel_length <= DIRECT_MAX_KERNEL_LENGTH:
+        return 'direct'
+    if kernel_length * OVERLAP_ADD_MIN_RATIO <= signal_length:
+        return 'overlap_add'
+    return 'fft'
+
+
+def trapezoid(y_values: np.ndarray, x_values: np.ndarray) -> float:
+    """
+    :param y_values: values of a function
+    :param x_values: sorted grid
+    :return: integral of the function with the trapezoidal rule
+    """
+    integrate = getattr(np, 'trapezoid', None) or getattr(np, 'trapz')  # np.trapz before numpy 2.0
+    return float(integrate(y_values, x_values))
+
+
+def kernel_integral(kernel: np.ndarray, x_values: np.ndarray, detuning: float, width: float) -> float:
+    """
+    integral of the doppler kernel: width * sqrt(2 pi) (gaussian of peak 1) if the grid resolves the gaussian and
+    contains its tails, else the trapezoidal integral of the kernel on the grid
+    :param kernel: doppler kernel on the grid
+    :param x_values: regular grid
+    :param detuning: center of the kernel (laser frequency)
+    :param width: doppler width
+    :return: integral of the kernel
+    """
+    step = (x_values[-1] - x_values[0]) / max(len(x_values) - 1, 1)
+    if width >= step > 0 and x_values[0] <= detuning - KERNEL_INTEGRAL_SUPPORT * width and \
+            detuning + KERNEL_INTEGRAL_SUPPORT * width <= x_values[-1]:
+        return width * math.sqrt(2 * math.pi)
+    if width == 0:
+        # dirac on the grid: the convolution by the kernel is the identity
+        return step
+    return trapezoid(kernel, x_values)
+
+
+def truncate_kernel(kernel: np.ndarray, half_length: int) -> Tuple[np.ndarray, float]:
+    """
+    keeps the center of a kernel: the convolution (mode 'same') by the truncated kernel stays aligned with the
+    convolution by the whole kernel
+    :param kernel: kernel
+    :param half_length: number of points kept on each side of the center ((len(kernel) - 1) // 2)
+    :return: truncated kernel, truncation error (part of the sum of the kernel which is removed)
+    """
+    center = (len(kernel) - 1) // 2
+    start = max(center - half_length, 0)
+    truncated = kernel[start:center + half_length + 1]
+    total = float(np.sum(kernel))
+    error = 1 - float(np.sum(truncated)) / total if total else 0.0
+    return truncated, max(error, 0.0)
+
+
+def doppler_broadened_inelastic_intensity(x_values, saturation_parameter, detuning, gamma, saturation_intensity,
+                                          width, intensity_error=0.0) -> np.ndarray:
+    """
+    convolution of the inelastic intensity by the normalised doppler kernel (gaussian of standard deviation width),
+    computed on any grid with the Faddeeva function from the poles of the inelastic intensity:
+    1 / (z - pole) convolved by the gaussian is -i sqrt(pi) / (sqrt(2) width) * wofz((z - pole) / (sqrt(2) width))
+    :param x_values: frequencies of the atom(variable), shape (n,)
+    :param saturation_parameter: saturation parameter
+    :param detuning: detuning
+    :param gamma: default at 1
+    :param saturation_intensity: saturation intensity
+    :param width: doppler width
+    :param intensity_error: intensity error, scalar or array of shape (m,)
+    :return: doppler broadened inelastic intensity, shape (n,) or (m, n)
+    """
+    if width == 0:
+        return kernel_backend().inelastic_intensity(x_values, saturation_parameter, detuning, gamma,
+                                                    saturation_intensity, intensity_error)
+    from scipy import special  # imported on the first convolution (slow import)
+    poles, residues = inelastic_intensity_poles(saturation_parameter, detuning, gamma, saturation_intensity,
+                                                intensity_error)
+    z = (np.asarray(x_values, dtype=float) - detuning) / gamma
+    scale = math.sqrt(2) * width / gamma
+
+    result = np.zeros(np.shape(poles)[:-1] + np.shape(z), dtype=complex)
+    for k in range(np.shape(poles)[-1]):
+        pole = poles[..., k, np.newaxis]
+        result += residues[..., k, np.newaxis] * special.wofz((z - pole) / scale)
+    return 2 * math.sqrt(math.pi) / scale * result.imag
+
+
+class DopplerKernelCache:
+    """
+    bounded LRU cache of doppler kernels and of their FFTs, keyed by (temperature, angle, grid relative to the
+    detuning): a regular grid with the same step and length reuses the kernel when the detuning or the span moves it
+    """
+
+    def __init__(self, maxsize: int = 8):
+        """
+        :param maxsize: maximum number of kernels kept in the cache
+        """
+        self.maxsize = maxsize
+        self.kernels = OrderedDict()
+        self.lock = threading.Lock()
+
+    def entry(self, x_values: np.ndarray, detuning: float, temperature: float, angle_radians: float) -> dict:
+        """
+        finds (or computes) the cache entry of a kernel
+        :param x_values: grid of the kernel
+        :param detuning: center of the kernel (laser frequency)
+        :param temperature: temperature in kelvin
+        :param angle_radians: angle in radians
+        :return: cache entry: {'kernel': kernel, 'integral': integral of the kernel,
+            'fft': {fft_length: real FFT of the kernel},
+            'truncated': {support: (truncated kernel, truncation error, {fft_length: real FFT})}}
+        """
+        x_values = np.asarray(x_values, dtype=float)
+        key = (temperature, angle_radians, kernel_key(x_values, detuning))
+        with self.lock:
+            if key in self.kernels:
+                self.kernels.move_to_end(key)
+                return self.kernels[key]
+        kernel = kernel_backend().doppler_broadened_spectrum(x_values, detuning, temperature, angle_radians)
+        kernel.flags.writeable = False
+        width = doppler_width(temperature, angle_radians)
+        entry = {'kernel': kernel, 'integral': kernel_integral(kernel, x_values, detuning, width), 'fft': {},
+                 'truncated': {}, 'width': width, 'step': (x_values[-1] - x_values[0]) / max(len(x_values) - 1, 1)}
+        with self.lock:
+            self.kernels[key] = entry
+            while len(self.kernels) > self.maxsize:
+                self.kernels.popitem(last=False)
+        return entry
+
+    def kernel(self, x_values: np.ndarray, detuning: float, temperature: float, angle_radians: float) -> np.ndarray:
+        """
+        :param x_values: grid of the kernel
+        :param detuning: center of the kernel (laser frequency)
+        :param temperature: temperature in kelvin
+        :param angle_radians: angle in radians
+        :return: doppler kernel on the grid (read only)
+        """
+        return self.entry(x_values, detuning, temperature, angle_radians)['kernel']
+
+    def truncated(self, x_values: np.ndarray, detuning: float, temperature: float, angle_radians: float,
+                  support: Optional[float]) -> Tuple[np.ndarray, float, dict]:
+        """
+        :param x_values: grid of the kernel
+        :param detuning: center of the kernel (laser frequency)
+        :param temperature: temperature in kelvin
+        :param angle_radians: angle in radians
+        :param support: half width of the kept kernel in doppler widths (None: whole kernel)
+        :return: kernel truncated to ±support doppler widths, truncation error, cache of its FFTs
+        """
+        entry = self.entry(x_values, detuning, temperature, angle_radians)
+        kernel = entry['kernel']
+        if support is None or entry['width'] == 0 or entry['step'] <= 0:
+            return kernel, 0.0, entry['fft']
+        truncated = entry['truncated'].get(support)
+        if truncated is None:
+            half_length = int(math.ceil(support * entry['width'] / entry['step'])) + 1
+            kernel, error = truncate_kernel(kernel, half_length)
+            truncated = entry['truncated'][support] = (kernel, error, {})
+        return truncated
+
+    def convolve(self, y_values: np.ndarray, x_values: np.ndarray, detuning: float, temperature: float,
+                 angle_radians: float, support: Optional[float] = None) -> Tuple[np.ndarray, float]:
+        """
+        convolution (mode 'same') of y_values by the doppler kernel truncated to ±support doppler widths, computed
+        directly, by overlap-add or by FFT (with the FFT of the kernel cached) depending on the lengths
+        :param y_values: spectrum on the grid x_values, its last axis is convolved
+        :param x_values: grid of the spectrum and of the kernel
+        :param detuning: center of the kernel (laser frequency)
+        :param temperature: temperature in kelvin
+        :param angle_radians: angle in radians
+        :param support: half width of the kept kernel in doppler widths (None: whole kernel)
+        :return: convolution of y_values by the kernel, truncation error (part of the kernel which is removed)
+        """
+        from scipy import fft, signal  # imported on the first convolution (slow import)
+        kernel, error, kernel_ffts = self.truncated(x_values, detuning, temperature, angle_radians, support)
+        y_values = np.asarray(y_values, dtype=float)
+        method = choose_convolution_method(np.shape(y_values)[-1], len(kernel))
+        if method != 'fft':
+            kernel_nd = np.reshape(kernel, (1,) * (np.ndim(y_values) - 1) + (len(kernel),))
+            if method == 'direct':
+                return signal.convolve(y_values, kernel_nd, mode='same', method='direct'), error
+            return signal.oaconvolve(y_values, kernel_nd, mode='same', axes=-1), error
+        fft_length = fft.next_fast_len(np.shape(y_values)[-1] + len(kernel) - 1, real=True)
+        kernel_fft = kernel_ffts.get(fft_length)
+        if kernel_fft is None:
+            kernel_fft = kernel_ffts[fft_length] = fft.rfft(kernel, fft_length)
+        return fft_convolve_same(y_values, kernel_fft, fft_length, len(kernel)), error
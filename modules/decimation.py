@@ -0,0 +1,91 @@
+"""
+level of detail of the plotted lines and bands: the points of a line are reduced to a few points per pixel
+"""
+from typing import Tuple
+import numpy as np
+
+
+def view_slice(x_values: np.ndarray, x_min: float, x_max: float) -> slice:
+    """
+    :param x_values: sorted x values
+    :param x_min: start of the view
+    :param x_max: end of the view
+    :return: slice of the points of the view and of the points just outside of it
+    """
+    start = max(np.searchsorted(x_values, x_min, side='left') - 1, 0)
+    end = min(np.searchsorted(x_values, x_max, side='right') + 1, len(x_values))
+    return slice(start, end)
+
+
+def pixel_columns(x_view: np.ndarray, x_min: float, x_max: float, pixels: int) -> np.ndarray:
+    """
+    :param x_view: sorted x values of the view
+    :param x_min: start of the view
+    :param x_max: end of the view
+    :param pixels: width of the view in pixels
+    :return: pixel column of each point (-1 before the view, pixels after it)
+    """
+    return np.clip(((x_view - x_min) / (x_max - x_min) * pixels).astype(int), -1, pixels)
+
+
+def min_max_decimation(x_values: np.ndarray, y_values: np.ndarray, x_min: float, x_max: float,
+                       pixels: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    keeps, for each pixel column between x_min and x_max, the points of minimum and maximum of the line (so narrow
+    peaks are kept) and the points just outside of the view (so the line reaches the borders)
+    :param x_values: sorted x values of the line
+    :param y_values: y values of the line
+    :param x_min: start of the view
+    :param x_max: end of the view
+    :param pixels: width of the view in pixels
+    :return: decimated x values, decimated y values
+    """
+    x_values = np.asarray(x_values)
+    y_values = np.asarray(y_values)
+    view = view_slice(x_values, x_min, x_max)
+    pixels = max(int(pixels), 1)
+    if view.stop - view.start <= 2 * pixels or x_max <= x_min:
+        return x_values[view], y_values[view]
+
+    x_view = x_values[view]
+    y_view = y_values[view]
+    columns = pixel_columns(x_view, x_min, x_max, pixels)
+    # points sorted by column then by y value: the first and last points of each column are its minimum and maximum
+    order = np.lexsort((y_view, columns))
+    column_starts = np.flatnonzero(np.diff(columns[order], prepend=-2))
+    column_ends = np.append(column_starts[1:], len(order)) - 1
+    indices = np.concatenate([order[column_starts], order[column_ends], [0, len(x_view) - 1]])
+    indices = np.unique(indices)
+    return x_view[indices], y_view[indices]
+
+
+def band_decimation(x_values: np.ndarray, y_low: np.ndarray, y_high: np.ndarray, x_min: float, x_max: float,
+                    pixels: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    envelope of a band for each pixel column between x_min and x_max: the first and the last x value of the column
+    with the minimum of the lower edge and the maximum of the upper edge of the column (the band is never narrower)
+    :param x_values: sorted x values of the band
+    :param y_low: lower edge of the band
+    :param y_high: upper edge of the band
+    :param x_min: start of the view
+    :param x_max: end of the view
+    :param pixels: width of the view in pixels
+    :return: decimated x values, decimated lower edge, decimated upper edge
+    """
+    x_values = np.asarray(x_values)
+    y_low = np.asarray(y_low)
+    y_high = np.asarray(y_high)
+    view = view_slice(x_values, x_min, x_max)
+    pixels = max(int(pixels), 1)
+    if view.stop - view.start <= 2 * pixels or x_max <= x_min:
+        return x_values[view], y_low[view], y_high[view]
+
+    x_view = x_values[view]
+    columns = pixel_columns(x_view, x_min, x_max, pixels)
+    # the x values are sorted: the points of a column are contiguous
+    column_starts = np.flatnonzero(np.diff(columns, prepend=-2))
+    column_ends = np.append(column_starts[1:], len(x_view)) - 1
+    low = np.minimum.reduceat(y_low[view], column_starts)
+    high = np.maximum.reduceat(y_high[view], column_starts)
+    x_decimated = np.stack([x_view[column_starts], x_view[column_ends]], axis=1).ravel()
+    return x_decimated, np.repeat(low, 2), np.repeat(high, 2)
@@ -105,6 +105,23 @@ def doppler_broadened_spectrum(w: float, laser_frequency: float, temperature: fl
         return 0
 
 
+def doppler_broadened_spectrum_array(x_values, laser_frequency: float, temperature: float,
+                                     angle_radians: float) -> np.ndarray:
+    """
+    Calculates the doppler broadened spectrum for a whole array of w, the doppler width is computed once
+    :param x_values: frequencies of the atom(variable)
+    :param laser_frequency: frequency of the laser
+    :param temperature: temperature in kelvin
+    :param angle_radians: angle in radians
+    :return: doppler broadened spectrum (a dirac on the laser frequency if the doppler width is 0)
+    """
+    w = np.asarray(x_values, dtype=float)
+    width = doppler_width(temperature, angle_radians)
+    if width == 0:
+        return (w == laser_frequency).astype(float)
+    return np.exp(-((laser_frequency - w) ** 2) / (2 * width ** 2))
+
+
 def elastic_intensity(saturation_parameter, detuning, gamma, saturation_intensity, intensity_error):
     """
     Calculates the elastic_intensity
@@ -162,3 +179,155 @@ def inelastic_intensity(w, saturation_parameter, detuning, gamma, saturation_int
     big_part = numerator_big_part / (denominator_big_part1 ** 2 + d_g_b * denominator_big_part2 ** 2)
     result = first_part * second_part * big_part
     return result
+
+
+def inelastic_intensity_array(x_values, saturation_parameter, detuning, gamma, saturation_intensity,
+                              intensity_error=0.0) -> np.ndarray:
+    """
+    Calculates the inelastic intensity for a whole array of w in a single broadcast pass
+    (same formula as inelastic_intensity)
+    :param x_values: frequencies of the atom(variable), shape (n,)
+    :param saturation_parameter: saturation parameter, scalar or array of shape (m,)
+    :param detuning: detuning
+    :param gamma: default at 1
+    :param saturation_intensity: saturation intensity
+    :param intensity_error: intensity error, scalar or array of shape (m,)
+    :return: inelastic intensity, shape (n,) or (m, n) if an array of saturation parameters or intensity errors
+    is given (one row per realisation)
+    """
+    w = np.asarray(x_values, dtype=float)
+
+    # applying the intensity error on the laser intensity (one value per realisation)
+    laser_intensity = np.asarray(saturation_parameter, dtype=float) * saturation_intensity
+    laser_intensity = laser_intensity + np.asarray(intensity_error, dtype=float)
+    s = saturation_parameter_from_laser_intensity(laser_intensity, saturation_intensity)
+    if s.ndim:
+        s = s[..., np.newaxis]
+
+    # detuning-only factors are computed once per call
+    d_l_g_b = (detuning / gamma) ** 2
+    d_g_b = ((w - detuning) / gamma) ** 2  # δ = ω − ωL.
+    d_g_b_terms = d_g_b + 1
+    denominator_d_part1 = (1 / 4) + d_l_g_b - 2 * d_g_b
+    denominator_d_part2 = (5 / 4) + d_l_g_b - d_g_b
+
+    first_second_part = (1 / gamma) * (s ** 2) / (8 * math.pi * (1 + s + 4 * d_l_g_b))
+    numerator_big_part = d_g_b_terms + s / 4
+    denominator_big_part1 = denominator_d_part1 + s / 4
+    denominator_big_part2 = denominator_d_part2 + s / 2
+
+    big_part = numerator_big_part / (denominator_big_part1 ** 2 + d_g_b * denominator_big_part2 ** 2)
+    return first_second_part * big_part
+
+
+def inelastic_intensity_poles(saturation_parameter, detuning, gamma, saturation_intensity, intensity_error=0.0):
+    """
+    Partial fraction decomposition of the inelastic intensity in z = (w - detuning) / gamma:
+    inelastic_intensity = 2 * Re(sum(residues / (z - poles))), the sum is over the 3 poles with Im(pole) < 0
+    :param saturation_parameter: saturation parameter
+    :param detuning: detuning
+    :param gamma: default at 1
+    :param saturation_intensity: saturation intensity
+    :param intensity_error: intensity error, scalar or array of shape (m,)
+    :return: poles, residues (shape (3,) or (m, 3))
+    """
+    laser_intensity = np.asarray(saturation_parameter, dtype=float) * saturation_intensity
+    laser_intensity = laser_intensity + np.asarray(intensity_error, dtype=float)
+    s = saturation_parameter_from_laser_intensity(laser_intensity, saturation_intensity)
+    scalar = not np.ndim(s)
+    s = np.atleast_1d(s)[:, np.newaxis]
+
+    # inelastic_intensity = factor * (u + a) / ((a_part - 2u)² + u(b_part - u)²) with u = z²
+    d_l_g_b = (detuning / gamma) ** 2
+    factor = (1 / gamma) * (s ** 2) / (8 * math.pi * (1 + s + 4 * d_l_g_b))
+    a = s / 4 + 1
+    a_part = (1 / 4) + s / 4 + d_l_g_b
+    b_part = (5 / 4) + s / 2 + d_l_g_b
+
+    # roots of the denominator u³ + c2 u² + c1 u + c0 (eigenvalues of its companion matrix)
+    c2 = 4 - 2 * b_part
+    c1 = b_part ** 2 - 4 * a_part
+    c0 = a_part ** 2
+    companion = np.zeros((len(s), 3, 3))
+    companion[:, 0, :] = np.concatenate((-c2, -c1, -c0), axis=-1)
+    companion[:, 1, 0] = 1
+    companion[:, 2, 1] = 1
+    u = np.linalg.eigvals(companion)
+
+    # the denominator is positive for u >= 0 so the principal square root gives the poles with Im(z) < 0
+    poles = -1j * np.sqrt(-u + 0j)
+    residues = factor * (u + a) / ((3 * u ** 2 + 2 * c2 * u + c1) * 2 * poles)
+    if scalar:
+        return poles[0], residues[0]
+    return poles, residues
+
+
+def inelastic_span(saturation_parameter, detuning, gamma, saturation_intensity, intensity_error=0.0,
+                   relative_tolerance=5e-3, samples=256) -> float:
+    """
+    Finds the distance to the detuning after which the inelastic intensity stays under
+    relative_tolerance * (maximum of the inelastic intensity).
+    The tail of the spectrum decreases as 1/δ⁴, which gives the bracket, the border is then found by bisection
+    :param saturation_parameter: saturation parameter
+    :param detuning: detuning
+    :param gamma: default at 1
+    :param saturation_intensity: saturation intensity
+    :param intensity_error: intensity error
+    :param relative_tolerance: value of the border relative to the maximum of the spectrum
+    :param samples: number of points used to find the maximum and the bracket
+    :return: span of the inelastic intensity around the detuning
+    """
+
+    def spectrum(d):
+        return inelastic_intensity_array(detuning + d, saturation_parameter, detuning, gamma, saturation_intensity,
+                                         intensity_error)
+
+    s = (saturation_parameter * saturation_intensity + intensity_error) / saturation_intensity
+    if s <= 0:
+        return 0.0
+    # the spectrum is symmetric around the detuning, its side peaks are at ± generalised rabi frequency
+    sideband = generalised_rabi_frequency(rabi_frequency_from_saturation_parameter(s), detuning, gamma) * gamma
+    peak_width = np.linspace(-2 * gamma, 2 * gamma, samples)
+    peak = float(np.max(spectrum(np.concatenate((np.linspace(0, sideband + 2 * gamma, samples),
+                                                  peak_width, sideband + peak_width)))))
+    target = relative_tolerance * peak
+
+    # asymptote: inelastic_intensity ~ s² / (8π γ (1 + s + 4 (Δ/γ)²)) * (γ/δ)⁴
+    tail = (s ** 2) / (8 * math.pi * gamma * (1 + s + 4 * (detuning / gamma) ** 2))
+    high = 2 * max(gamma * (tail / target) ** (1 / 4), sideband + gamma)
+    while spectrum(high) > target:
+        high *= 2
+
+    # last sample above the target gives a bracket that contains the border
+    d_values = np.linspace(0, high, samples)
+    above = np.flatnonzero(spectrum(d_values) > target)
+    if not len(above):
+        return 0.0
+    low, high = d_values[above[-1]], d_values[above[-1] + 1]
+    while high - low > 1e-9 * high:
+        middle = (low + high) / 2
+        if spectrum(middle) > target:
+            low = middle
+        else:
+            high = middle
+    return float(high)
+
+
+def intensity_error_quadrature(mu, sigma, uniform, order):
+    """
+    Calculates the nodes and weights to average over the intensity error normal(mu, sigma) + uniform(-uniform,
+    uniform) with a Gauss–Hermite × Gauss–Legendre quadrature:
+    mean(f) ≈ sum(weights * f(nodes))
+    :param mu: mean of the normal intensity error
+    :param sigma: standard deviation of the normal intensity error
+    :param uniform: half width of the uniform intensity error
+    :param order: number of nodes per distribution (only one node is used if the distribution is a dirac)
+    :return: intensity errors (nodes), weights (sum to 1)
+    """
+    order = max(int(order), 1)
+    hermite_nodes, hermite_weights = np.polynomial.hermite.hermgauss(order if sigma else 1)
+    legendre_nodes, legendre_weights = np.polynomial.legendre.leggauss(order if uniform else 1)
+
+    nodes = (mu + math.sqrt(2) * sigma * hermite_nodes)[:, np.newaxis] + uniform * legendre_nodes
+    weights = (hermite_weights / math.sqrt(math.pi))[:, np.newaxis] * (legendre_weights / 2)
+    return nodes.ravel(), weights.ravel()
@@ -1,114 +1,249 @@
-from typing import Dict, Any, Union, List
-from scipy import signal
-from scipy import integrate
-import random
+from typing import Dict, Any, Union, List, Optional, Tuple
 from modules.functions import *
+from modules.components import ComponentStore
+from modules.convolution import DopplerKernelCache, doppler_broadened_inelastic_intensity
+from modules.grid import uniform_grid, insert_points, point_indices, adaptive_grid, quantized_span
+from modules.spectral_delta import SpectralDelta
+from modules.parameters import GraphParameters
+from modules.backends import kernel_backend
 
 
 class NumbersGraph:
-    """base class for all graphs_to_update."""
-    # Resolution of the graph
-    resolution: int = 2000
-    # offset of the graph mainly used to center on detuning or to center on 0
-    offset: float = 0.0
-    # span of the graph
-    span: float = 10.0
-    # on-resonance saturation parameter
-    saturation_parameter: float = 1.0
-    # laser frequency-atom frequency
-    detuning: float = 0.0
-    gamma: float = 1.0  # scalar
-    angle: float = 90.0  #
-    temperature: float = 100.0
-    saturation_intensity: float = 1.669
-    laser_intensity_error_mu: float = 0.0
-    laser_intensity_error_sigma: float = 0.0
-    laser_intensity_error_uniform: float = 0.0
-
+    """base class for all graphs_to_update, a graph is computed only from its parameters (GraphParameters)"""
+    # tolerance of the linear interpolation of the adaptive grid relative to the maximum of the spectrum
+    adaptive_tolerance: float = 1e-4
+    # maximum size in bytes of a block of realisations evaluated at once
+    random_chunk_bytes: int = 64 * 2 ** 20
+    # spectrum components shared by all the graphs
+    components: ComponentStore = ComponentStore()
+    # inputs the spectrum of the graph depends on (key of its components)
+    dependencies: Tuple[str, ...] = ('saturation_parameter', 'detuning', 'gamma', 'saturation_intensity')
+    # inputs the grid of the graph depends on (with the dependencies, key of its cached results)
+    grid_fields: Tuple[str, ...] = ('resolution', 'offset', 'span', 'adaptive_grid')
+
+    # parameters of the last update, their fields are also attributes of the instance (self.detuning...)
+    parameters: GraphParameters
+    resolution: int
+    offset: float
+    span: float
+    adaptive_grid: bool
+    saturation_parameter: float
+    detuning: float
+    gamma: float
+    angle: float
+    temperature: float
+    saturation_intensity: float
+    laser_intensity_error_mu: float
+    laser_intensity_error_sigma: float
+    laser_intensity_error_uniform: float
+    laser_intensity_error_random_resolution: int
+    laser_intensity_error_seed: Optional[int]
+    laser_intensity_error_averaging: str
+    laser_intensity_error_quadrature_order: int
     graph_end: float
     graph_start: float
     graph_step: float
     y_values: List[float] or np.ndarray  # list of float
-    x_values: List[float] or np.ndarray  # list of float
+    y_standard_error: Optional[np.ndarray]  # standard error of y_values when averaged over the intensity error
+    spectral_delta: Optional[SpectralDelta]  # dirac of the spectrum (elastic intensity), it is not in y_values
+    x_values: np.ndarray  # sorted float64 array
+    point_indices: Dict[float, int]  # index in x_values of the points added with add_point_x
 
     def __init__(self):
         """
         init method
 
-        :attr x_values: list of values for the x axis
+        :attr x_values: values for the x axis
         :attr y_values: list of values for the y axis
+        :attr y_standard_error: standard error of the y values (set by update_with_random)
+        :attr spectral_delta: dirac of the spectrum (None if the spectrum has no dirac)
+        :attr point_indices: index in x_values of the points added with add_point_x
         :attr graph_step: step of the graph(space between 2 numbers on the x axis)
         :attr graph_start: start of the graph
         :attr graph_end: end of the graph
         """
-        self.x_values = []
+        self.x_values = np.zeros(0)
         self.y_values = []
+        self.y_standard_error = None
+        self.spectral_delta = None
+        self.point_indices = {}
         # define how the graph is created
-        self.graph_step = (self.span * 2) / self.resolution
-        self.graph_start = self.offset - self.span
-        self.graph_end = self.offset + self.span
+        NumbersGraph.update_inputs(self, GraphParameters())
+        self.update_bounds()
         self.color = 'white'
 
-    def update_inputs(self, inputs: Dict[Union[str, Any], Union[Union[str, float, int], Any]]) -> None:
+    def update_inputs(self, inputs: Union[GraphParameters, Dict[str, Any]]) -> None:
         """
-        this method updates the attributes of the current instance
-        :param inputs: update dictionary for the attributes of the current instance
+        this method replaces the parameters of the current instance, their fields are copied to its attributes
+        :param inputs: parameters or dictionary of inputs (the missing inputs have their default value)
         """
-        self.__dict__.update(inputs)
+        self.parameters = GraphParameters.of(inputs)
+        self.__dict__.update(self.parameters.as_dict())
 
     def update(self, inputs, intensity_error=0.0):
         """
         base update for the graph
         :param intensity_error:
-        :param inputs: update dictionary for the attributes of the current instance
+        :param inputs: parameters of the graph (GraphParameters or dictionary of inputs)
         """
         self.update_inputs(inputs)
+        self.update_bounds()
 
-        # calculate the graph size and step
+        # clearing lists
+        self.y_values = []
+        self.y_standard_error = None
+        self.spectral_delta = None
+
+        # fill the x values of the graph and add values for 0 and detuning
+        special_points = (0, self.detuning)
+        if self.adaptive_grid:
+            x_values = adaptive_grid(lambda x: self.grid_spectrum(x, intensity_error), self.graph_start, self.graph_end,
+                                     self.grid_features(), 2 * self.gamma, self.resolution, self.adaptive_tolerance,
+                                     min_step=self.graph_step / 4)
+        else:
+            x_values = uniform_grid(self.graph_start, self.graph_end, self.graph_step)
+        # a special point within a rounding error of the grid replaces its grid point (the grid stays regular)
+        self.x_values, _ = insert_points(x_values, special_points, tolerance=1e-6 * self.graph_step)
+        self.point_indices = point_indices(self.x_values, special_points)
+
+    def update_bounds(self):
+        """
+        calculates the graph size and step
+        """
         self.graph_step = (self.span * 2) / self.resolution
         self.graph_start = self.offset - self.span
         self.graph_end = self.offset + self.span
 
-        # clearing lists
-        self.x_values = []
-        self.y_values = []
+    def grid_features(self):
+        """
+        :return: points around which the adaptive grid is dense: 0, the detuning and the sidebands of the spectrum at
+        detuning ± generalised rabi frequency
+        """
+        rabi_frequency = rabi_frequency_from_saturation_parameter(max(self.saturation_parameter, 0))
+        sideband = generalised_rabi_frequency(rabi_frequency, self.detuning, self.gamma) * self.gamma
+        return 0, self.detuning, self.detuning - sideband, self.detuning + sideband
 
-        # fill the x values of the graph
-        # noinspection PyTypeChecker
-        self.x_values = np.arange(self.graph_start, self.graph_end, self.graph_step).tolist()
+    def add_point_x(self, point_x):
+        """
+        adds a point to the x axis
+        :return: index of the point in x_values
+        """
+        self.x_values, (index,) = insert_points(self.x_values, (point_x,))
+        self.point_indices = point_indices(self.x_values, (*self.point_indices, point_x))
+        return int(index)
 
-        # adding values for 0 and detuning
-        self.add_point_x(0)
-        self.add_point_x(self.detuning)
+    def spectrum(self, x_values, intensity_error=0.0):
+        """
+        Calculates the y values of the graph for any x values
+        :param x_values: values for the x axis
+        :param intensity_error: intensity error, scalar or array of shape (m,) (one realisation per row)
+        :return: y values, shape (n,) or (m, n)
+        """
+        return np.zeros(np.shape(intensity_error) + np.shape(x_values))
 
-    def add_point_x(self, point_x):
-        """adds a point to the x axis"""
-        try:
-            self.x_values.index(point_x)
-        except ValueError:
-            self.x_values.append(point_x)
-            self.x_values.sort()
+    def delta(self, intensity_error=0.0):
+        """
+        dirac part of the spectrum, it is not included in spectrum
+        :param intensity_error: intensity error, scalar or array of shape (m,) (one realisation per row)
+        :return: dirac of weight of shape () or (m,) (None if the spectrum has no dirac)
+        """
+        return None
 
-    def update_with_random(self, inputs):
-        n = inputs['laser_intensity_error_random_resolution']
-        self.update_inputs(inputs)
+    def component(self, name, x_values, intensity_error, function):
+        """
+        finds a spectrum component in the shared store, it is computed only if no graph computed it with the same
+        dependencies, x values and intensity error (realisations of the intensity error drawn without seed are not
+        stored: they are never drawn again)
+        :param name: name of the component
+        :param x_values: values for the x axis
+        :param intensity_error: intensity error, scalar or array of shape (m,)
+        :param function: computes the component from (x_values, intensity_error)
+        :return: y values (read only if it is stored)
+        """
+        values = tuple(getattr(self, field) for field in self.dependencies)
+        keep = np.ndim(intensity_error) == 0 or self.laser_intensity_error_averaging == 'quadrature' or \
+            self.laser_intensity_error_seed is not None
+        return self.components.get(name, values, x_values, intensity_error, function, keep)
 
-        y_values_with_random = []
-        for loop in range(int(n)):
-            intensity_error = random.normalvariate(self.laser_intensity_error_mu,
-                                                   self.laser_intensity_error_sigma) + random.uniform(
-                -self.laser_intensity_error_uniform, self.laser_intensity_error_uniform)
-            self.update(inputs,
-                        intensity_error=intensity_error)
-            # print(intensity_error)
-            y_values_with_random.append(self.y_values.copy())
-        arr = np.array(y_values_with_random)
+    def grid_spectrum(self, x_values, intensity_error=0.0):
+        """
+        spectrum used to refine the adaptive grid, the graphs whose spectrum is cached evaluate it without the caches
+        (the temporary points of each refinement pass would push the spectra of the graphs out of the caches)
+        :param x_values: values for the x axis
+        :param intensity_error: intensity error
+        :return: y values
+        """
+        return self.spectrum(x_values, intensity_error)
 
-        self.y_values = np.sum(arr, axis=0) / n
-        self.y_values = np.abs(self.y_values)
+    def intensity_errors(self, n):
+        """
+        draws all the realisations of the intensity error at once
+        :param n: number of realisations
+        :return: intensity errors, shape (n,)
+        """
+        generator = np.random.default_rng(self.laser_intensity_error_seed)
+        return generator.normal(self.laser_intensity_error_mu, self.laser_intensity_error_sigma, n) + \
+            generator.uniform(-self.laser_intensity_error_uniform, self.laser_intensity_error_uniform, n)
+
+    def intensity_error_samples(self):
+        """
+        realisations of the intensity error averaged by update_with_random (laser_intensity_error_averaging)
+        :return: intensity errors and weights of the mean, shape (m,) (None if there is no realisation)
+        """
+        if self.laser_intensity_error_averaging == 'quadrature':
+            return intensity_error_quadrature(
+                self.laser_intensity_error_mu, self.laser_intensity_error_sigma, self.laser_intensity_error_uniform,
+                self.laser_intensity_error_quadrature_order)
+        n = int(self.laser_intensity_error_random_resolution)
+        if n < 1:
+            return None
+        return self.intensity_errors(n), np.full(n, 1 / n)
+
+    def realisations(self, intensity_error):
+        """
+        y values of the graph on its x values for realisations of the intensity error (averaged by update_with_random)
+        :param intensity_error: intensity error, scalar or array of shape (m,) (one realisation per row)
+        :return: y values, shape (n,) or (m, n)
+        """
+        return self.spectrum(self.x_values, intensity_error)
+
+    def update_with_random(self, inputs):
+        """
+        Calculates the mean of the y values over the intensity error, either over random realisations (Monte Carlo,
+        with its standard error) or with a quadrature (laser_intensity_error_averaging), the realisations are
+        evaluated by blocks of at most random_chunk_bytes
+        :param inputs: parameters of the graph (GraphParameters or dictionary of inputs)
+        """
+        NumbersGraph.update(self, inputs)
+        samples = self.intensity_error_samples()
+        if samples is None:
+            self.update(inputs)
+            return
+        intensity_errors, weights = samples
+
+        # sums are shifted by the spectrum without random to keep the variance accurate
+        shift = self.realisations(self.laser_intensity_error_mu)
+        mean = np.zeros(len(self.x_values))
+        mean_squares = np.zeros(len(self.x_values))
+        chunk = max(1, self.random_chunk_bytes // (8 * max(len(self.x_values), 1)))
+        for start in range(0, len(intensity_errors), chunk):
+            y_values = self.realisations(intensity_errors[start:start + chunk]) - shift
+            mean += weights[start:start + chunk] @ y_values
+            mean_squares += weights[start:start + chunk] @ (y_values ** 2)
+
+        self.y_values = np.abs(mean + shift)
+        if self.laser_intensity_error_averaging != 'quadrature':
+            n = len(intensity_errors)
+            variance = np.maximum(mean_squares - mean ** 2, 0) * n / (n - 1) if n > 1 else np.zeros_like(mean)
+            self.y_standard_error = np.sqrt(variance / n)
+        delta = self.delta(intensity_errors)
+        self.spectral_delta = None if delta is None else delta.mean(weights)
 
 
 class InelasticIntensity(NumbersGraph):
+    # relative value of the spectrum at the border found by find_border
+    span_relative_tolerance: float = 5e-3
+
     def __init__(self):
         super().__init__()
         self.name = "Inelastic Intensity"
@@ -119,38 +254,47 @@ class InelasticIntensity(NumbersGraph):
         Calculates the y values of the graph
         :param intensity_error:
         :param intensity_error:
-        :param inputs: update dictionary for the attributes of the current instance
+        :param inputs: parameters of the graph (GraphParameters or dictionary of inputs)
         """
-        NumbersGraph.update(self, inputs)
+        NumbersGraph.update(self, inputs, intensity_error)
+        self.y_values = self.spectrum(self.x_values, intensity_error)
+
+    def spectrum(self, x_values, intensity_error=0.0):
+        """
+        Calculates the inelastic intensity for any x values
+        :param x_values: values for the x axis
+        :param intensity_error: intensity error, scalar or array of shape (m,) (one realisation per row)
+        :return: y values, shape (n,) or (m, n)
+        """
+        return self.component('inelastic', x_values, intensity_error, self.grid_spectrum)
 
-        self.y_values = [
-            inelastic_intensity(x, self.saturation_parameter, self.detuning, self.gamma, self.saturation_intensity,
-                                intensity_error)
-            for x in self.x_values]
+    def grid_spectrum(self, x_values, intensity_error=0.0):
+        """
+        Calculates the inelastic intensity for any x values without the component store
+        :param x_values: values for the x axis
+        :param intensity_error: intensity error, scalar or array of shape (m,) (one realisation per row)
+        :return: y values, shape (n,) or (m, n)
+        """
+        return kernel_backend().inelastic_intensity(x_values, self.saturation_parameter, self.detuning, self.gamma,
+                                                    self.saturation_intensity, intensity_error)
 
     def find_border(self, inputs):
         """
-        finds the span for the function
-        :param inputs: update dictionary for the attributes of the current instance
+        finds the span for the function: distance to the offset after which the inelastic intensity stays under
+        span_relative_tolerance * (maximum of the inelastic intensity)
+        :param inputs: parameters of the graph (GraphParameters or dictionary of inputs)
         :return: span
         """
-        running = True
-        custom_input = inputs.copy()
-        custom_input['span'] = 0
-        custom_input['resolution'] = 200
-        while running:
-            custom_input['span'] += 1
-            self.update(custom_input)
-            max_y = max(self.y_values)
-            exponent = int("{:e}".format(max_y).split("e-")[1])
-            abs_tolerance = float(f'0.{"0" * exponent}01')
-            for y in self.y_values:
-                if math.isclose(y, 0, abs_tol=abs_tolerance):
-                    running = False
-        return custom_input['span']
+        self.update_inputs(inputs)
+        span = inelastic_span(self.saturation_parameter, self.detuning, self.gamma, self.saturation_intensity,
+                              relative_tolerance=self.span_relative_tolerance)
+        return max(span + abs(self.offset - self.detuning), self.gamma)
 
 
 class ElasticIntensity(NumbersGraph):
+    """the elastic intensity is a dirac on the detuning: the graph has no line, only its spectral_delta"""
+    grid_fields: Tuple[str, ...] = ()
+
     def __init__(self):
         super().__init__()
         self.name = "Elastic Intensity"
@@ -159,22 +303,57 @@ class ElasticIntensity(NumbersGraph):
 
     def update(self, inputs, intensity_error=0.0):
         """
-        Calculates the y values of the graph
+        Calculates the dirac of the graph (no grid is built)
         :param intensity_error:
-        :param inputs: update dictionary for the attributes of the current instance
+        :param inputs: parameters of the graph (GraphParameters or dictionary of inputs)
         """
-        NumbersGraph.update(self, inputs)
-        self.y_values = [0] * len(self.x_values)
-        self.value = elastic_intensity(self.saturation_parameter, self.detuning, self.gamma, self.saturation_intensity,
-                                       intensity_error)
-        try:
-            self.y_values[self.x_values.index(self.detuning)] = self.value
+        self.update_inputs(inputs)
+        self.update_bounds()
+        self.x_values = np.zeros(0)
+        self.y_values = np.zeros(0)
+        self.y_standard_error = None
+        self.point_indices = {}
+        self.spectral_delta = self.delta(intensity_error)
+        self.value = self.spectral_delta.weight
+
+    def spectrum(self, x_values, intensity_error=0.0):
+        """
+        the elastic intensity has no continuous part
+        :param x_values: values for the x axis
+        :param intensity_error: intensity error, scalar or array of shape (m,) (one realisation per row)
+        :return: zeros, shape (n,) or (m, n)
+        """
+        return np.zeros(np.shape(intensity_error) + np.shape(x_values))
 
-        except ValueError:
-            for i, x in enumerate(self.x_values):
-                if self.detuning - self.graph_step < x < self.detuning + self.graph_step:
-                    self.y_values[i] = self.value
-                    break
+    def delta(self, intensity_error=0.0):
+        """
+        :param intensity_error: intensity error, scalar or array of shape (m,) (one realisation per row)
+        :return: dirac of the elastic intensity on the detuning
+        """
+        return SpectralDelta(self.detuning, elastic_intensity(
+            self.saturation_parameter, self.detuning, self.gamma, self.saturation_intensity,
+            np.asarray(intensity_error, dtype=float)))
+
+    def grid_spectrum(self, x_values, intensity_error=0.0):
+        """
+        the dirac does not need more points than the detuning
+        :param x_values: values for the x axis
+        :param intensity_error: intensity error
+        :return: zeros
+        """
+        return np.zeros(len(x_values))
+
+    def update_with_random(self, inputs):
+        """
+        Calculates the mean of the dirac over realisations of the intensity error
+        :param inputs: parameters of the graph (GraphParameters or dictionary of inputs)
+        """
+        self.update(inputs)
+        samples = self.intensity_error_samples()
+        if samples is not None:
+            intensity_errors, weights = samples
+            self.spectral_delta = self.delta(intensity_errors).mean(weights)
+            self.value = self.spectral_delta.weight
 
 
 class Intensity(NumbersGraph):
@@ -191,36 +370,120 @@ class Intensity(NumbersGraph):
         """
         Calculates the y values of the graph
         :param intensity_error:
-        :param inputs: update dictionary for the attributes of the current instance
+        :param inputs: parameters of the graph (GraphParameters or dictionary of inputs)
         """
-        NumbersGraph.update(self, inputs)
+        NumbersGraph.update(self, inputs, intensity_error)
+        self.y_values = self.spectrum(self.x_values, intensity_error)
+        self.spectral_delta = self.delta(intensity_error)
+
+    def update_inputs(self, inputs):
+        """
+        updates the attributes of the current instance and of the elastic and inelastic graphs
+        :param inputs: parameters of the graph (GraphParameters or dictionary of inputs)
+        """
+        NumbersGraph.update_inputs(self, inputs)
+        self.elastic_graph.update_inputs(self.parameters)
+        self.inelastic_graph.update_inputs(self.parameters)
+
+    def spectrum(self, x_values, intensity_error=0.0):
+        """
+        Calculates the continuous part of the intensity (the inelastic intensity) for any x values, the elastic
+        intensity is its dirac
+        :param x_values: values for the x axis
+        :param intensity_error: intensity error, scalar or array of shape (m,) (one realisation per row)
+        :return: y values, shape (n,) or (m, n)
+        """
+        return self.inelastic_graph.spectrum(x_values, intensity_error)
+
+    def grid_spectrum(self, x_values, intensity_error=0.0):
+        """
+        continuous part of the intensity without the component store
+        :param x_values: values for the x axis
+        :param intensity_error: intensity error
+        :return: y values
+        """
+        return self.inelastic_graph.grid_spectrum(x_values, intensity_error)
 
-        self.elastic_graph.update(inputs, intensity_error=intensity_error)
-        self.inelastic_graph.update(inputs, intensity_error=intensity_error)
-        self.y_values = np.array(self.elastic_graph.y_values) + np.array(self.inelastic_graph.y_values)
+    def delta(self, intensity_error=0.0):
+        """
+        :param intensity_error: intensity error, scalar or array of shape (m,) (one realisation per row)
+        :return: dirac of the elastic intensity
+        """
+        return self.elastic_graph.delta(intensity_error)
 
 
 class DopplerBroadenedSpectrum(NumbersGraph):
+    dependencies: Tuple[str, ...] = NumbersGraph.dependencies + ('temperature', 'angle')
+    # kernels and their FFTs shared by all the instances
+    kernel_cache: DopplerKernelCache = DopplerKernelCache()
+
     def __init__(self):
         super().__init__()
         self.name = 'Doppler Broadened Spectrum'
+        self.truncation_error = 0.0
 
     def update(self, inputs, intensity_error=0.0):
         """
         Calculates the y values of the graph
         :param intensity_error:
-        :param inputs: update dictionary for the attributes of the current instance
+        :param inputs: parameters of the graph (GraphParameters or dictionary of inputs)
         """
-        NumbersGraph.update(self, inputs)
-        for x in self.x_values:
-            y = doppler_broadened_spectrum(x, self.detuning, self.temperature * (10 ** -6), math.radians(self.angle))
-            # if y != 0:
-            self.y_values.append(y)
+        NumbersGraph.update(self, inputs, intensity_error)
+        self.y_values = self.spectrum(self.x_values, intensity_error)
+
+    def update_with_random(self, inputs):
+        """
+        the doppler broadened spectrum does not depend on the intensity error: no average and no standard error
+        :param inputs: parameters of the graph (GraphParameters or dictionary of inputs)
+        """
+        self.update(inputs)
+
+    def spectrum(self, x_values, intensity_error=0.0):
+        """
+        Calculates the doppler broadened spectrum for any x values (it does not depend on the intensity error)
+        :param x_values: values for the x axis
+        :param intensity_error: intensity error, scalar or array of shape (m,) (one realisation per row)
+        :return: y values, shape (n,) or (m, n)
+        """
+        y_values = self.kernel_cache.kernel(x_values, self.detuning, self.temperature * (10 ** -6),
+                                            math.radians(self.angle))
+        if np.ndim(intensity_error):
+            return np.broadcast_to(y_values, np.shape(intensity_error) + np.shape(x_values))
+        return y_values
+
+    def grid_spectrum(self, x_values, intensity_error=0.0):
+        """
+        doppler broadened spectrum without the kernel cache
+        :param x_values: values for the x axis
+        :param intensity_error: intensity error (not used)
+        :return: y values
+        """
+        return kernel_backend().doppler_broadened_spectrum(x_values, self.detuning, self.temperature * (10 ** -6),
+                                                           math.radians(self.angle))
+
+    def integral(self):
+        """
+        :return: integral of the doppler broadened spectrum over frequency (closed form when the grid allows it)
+        """
+        return self.kernel_cache.entry(self.x_values, self.detuning, self.temperature * (10 ** -6),
+                                       math.radians(self.angle))['integral']
+
+    def convolve(self, y_values, support=None):
+        """
+        convolution of a spectrum by the doppler broadened spectrum (the kernel and its FFT are cached), the part of
+        the kernel which is removed by the truncation is kept in truncation_error
+        :param y_values: spectrum on the x values of the graph
+        :param support: half width of the kept kernel in doppler widths (None: whole kernel)
+        :return: convolution (same size as y_values)
+        """
+        y_values, self.truncation_error = self.kernel_cache.convolve(
+            y_values, self.x_values, self.detuning, self.temperature * (10 ** -6), math.radians(self.angle), support)
+        return y_values
 
     def find_resolution(self, inputs):
         """
         finds the resolution of the graph (deprecated)
-        :param inputs: update dictionary for the attributes of the current instance
+        :param inputs: parameters of the graph (GraphParameters or dictionary of inputs)
         """
         span = 0
         running = True
@@ -246,6 +509,18 @@ class DopplerBroadenedSpectrum(NumbersGraph):
 
 
 class ElasticInelasticTemperatureIntensity(NumbersGraph):
+    dependencies: Tuple[str, ...] = NumbersGraph.dependencies + ('temperature', 'angle')
+    # the grid is centered on the detuning and its span is found from the spectrum (resolution, offset and span are
+    # not used)
+    grid_fields: Tuple[str, ...] = ('temperature_resolution', 'convolution_method', 'adaptive_grid')
+    # half width of the doppler kernel kept for the FFT convolution, in doppler widths (None: whole kernel)
+    kernel_support: Optional[float] = 6.0
+    # the span is rounded up to a ladder of this many values per octave: the step of the grid (and the doppler kernel)
+    # stays the same when the saturation parameter changes a little
+    span_steps_per_octave: int = 16
+    convolution_method: str
+    temperature_resolution: int
+
     def __init__(self):
         super().__init__()
         self.name = 'Inelastic Intensity + Elastic Intensity + Temperature'
@@ -253,70 +528,157 @@ class ElasticInelasticTemperatureIntensity(NumbersGraph):
         self.elastic_inelastic_intensity = InelasticIntensity()
         self.elastic_graph = ElasticIntensity()
         self.color = 'green'
+        # part of the doppler kernel removed by its truncation to kernel_support
+        self.truncation_error = 0.0
+
+    def update_inputs(self, inputs):
+        """
+        updates the attributes of the current instance, of the elastic graph (its dirac is used by spectrum) and of the
+        inelastic graph (its spectrum is convolved by convolve_components)
+        :param inputs: parameters of the graph (GraphParameters or dictionary of inputs)
+        """
+        NumbersGraph.update_inputs(self, inputs)
+        self.elastic_graph.update_inputs(self.parameters)
+        self.elastic_inelastic_intensity.update_inputs(self.parameters)
+
+    def graph_parameters(self, inputs, span_factor):
+        """
+        parameters of the grid of the graph: centered on the detuning, temperature_resolution points, span fitted to
+        the inelastic intensity (rounded up to span_steps_per_octave values per octave)
+        :param inputs: parameters of the graph (GraphParameters or dictionary of inputs)
+        :param span_factor: span relative to the span found by InelasticIntensity.find_border
+        :return: parameters
+        """
+        parameters = GraphParameters.of(inputs)
+        parameters = parameters.replace(offset=parameters.detuning, resolution=parameters.temperature_resolution)
+        # the FFT convolution needs a regular grid
+        adaptive = parameters.adaptive_grid and parameters.convolution_method == 'analytic'
+        span = self.elastic_inelastic_intensity.find_border(parameters) * span_factor
+        return parameters.replace(span=quantized_span(span, self.span_steps_per_octave), adaptive_grid=adaptive)
 
     def update(self, inputs, intensity_error=0.0):
         """
         Calculates the y values of the graph
         :param intensity_error:
-        :param inputs: update dictionary for the attributes of the current instance
+        :param inputs: parameters of the graph (GraphParameters or dictionary of inputs)
         """
-        new_inputs = inputs.copy()
-        new_inputs['offset'] = inputs['detuning']
+        new_inputs = self.graph_parameters(inputs, 1.4)
+
+        NumbersGraph.update(self, new_inputs, intensity_error)
+        self.truncation_error = 0.0
+        if self.convolution_method == 'fft':
+            self.doppler_broadened_spectrum.update(new_inputs)
+        self.y_values = self.realisations(intensity_error)
+        self.spectral_delta = self.delta(intensity_error)
 
-        # new_inputs['resolution'] = self.doppler_broadened_spectrum.find_resolution(inputs, offset=inputs['detuning'])
-        new_inputs['resolution'] = 20000
-        new_inputs['span'] = self.elastic_inelastic_intensity.find_border(new_inputs) * 1.4
+    def update_with_random(self, inputs):
+        """
+        Calculates the mean of the y values over the intensity error, the FFT convolution is linear so the
+        realisations are convolved one by one and the standard error is the one of the convolved realisations
+        :param inputs: parameters of the graph (GraphParameters or dictionary of inputs)
+        """
+        new_inputs = self.graph_parameters(inputs, 1)
 
         NumbersGraph.update(self, new_inputs)
+        self.truncation_error = 0.0
+        if self.convolution_method == 'fft':
+            self.doppler_broadened_spectrum.update(new_inputs)
+        NumbersGraph.update_with_random(self, new_inputs)
 
-        self.elastic_graph.update(new_inputs)
-        self.elastic_inelastic_intensity.update(new_inputs)
-        self.doppler_broadened_spectrum.update(new_inputs)
-        # Inelastic Intensity Convolution
-        self.y_values = signal.convolve(
-            np.array(self.elastic_inelastic_intensity.y_values),
-            self.doppler_broadened_spectrum.y_values,
-            mode='same', method='fft')
-        # normalization
-        self.y_values /= integrate.simpson(self.y_values, self.x_values)
-        self.y_values *= sum(self.elastic_inelastic_intensity.y_values) / sum(self.y_values)
-
-        # adding the convolution of the dirac as the convolution is bilinear
-        convolution_dirac = np.array(self.doppler_broadened_spectrum.y_values) * (
-                self.elastic_graph.value * self.graph_step / integrate.simpson(self.doppler_broadened_spectrum.y_values,
-                                                                               self.x_values))
-
-        self.y_values += convolution_dirac
+    def realisations(self, intensity_error):
+        """
+        y values of the graph on its x values with the analytic or the FFT convolution
+        :param intensity_error: intensity error, scalar or array of shape (m,) (one realisation per row)
+        :return: y values, shape (n,) or (m, n)
+        """
+        if self.convolution_method == 'analytic':
+            return self.spectrum(self.x_values, intensity_error)
+        return self.convolve_components(intensity_error)
 
-    def update_with_random(self, inputs):
+    def convolve_components(self, intensity_error=0.0):
         """
-        Calculates the y values of the graph
-        :param inputs: update dictionary for the attributes of the current instance
+        FFT path: convolution of the inelastic intensity and of the elastic dirac by the doppler kernel normalised by
+        its integral (the convolution of the dirac is the kernel scaled by its weight, the dirac stays a dirac when the
+        doppler width is 0), the part of the kernel which is removed by its truncation is kept in truncation_error
+        :param intensity_error: intensity error, scalar or array of shape (m,) (one realisation per row)
+        :return: y values, shape (n,) or (m, n)
+        """
+        integral = self.doppler_broadened_spectrum.integral()
+        y_values = self.doppler_broadened_spectrum.convolve(
+            self.elastic_inelastic_intensity.spectrum(self.x_values, intensity_error),
+            self.kernel_support) * (self.graph_step / integral)
+        self.truncation_error = self.doppler_broadened_spectrum.truncation_error
+        if doppler_width(self.temperature * (10 ** -6), math.radians(self.angle)) == 0:
+            return y_values
+        return y_values + self.elastic_graph.delta(intensity_error).convolve(
+            self.doppler_broadened_spectrum.y_values, integral, self.graph_step)
+
+    def spectrum(self, x_values, intensity_error=0.0):
         """
-        new_inputs = inputs.copy()
-        new_inputs['offset'] = inputs['detuning']
+        Calculates the doppler broadened intensity for any x values with the analytic convolution, the elastic
+        intensity is a dirac of weight value * graph_step
+        :param x_values: values for the x axis
+        :param intensity_error: intensity error, scalar or array of shape (m,) (one realisation per row)
+        :return: y values, shape (n,) or (m, n)
+        """
+        y_values = self.component('doppler_broadened_inelastic', x_values, intensity_error,
+                                  self.broadened_inelastic_intensity)
+        return self.with_broadened_delta(y_values, x_values, intensity_error)
 
-        # new_inputs['resolution'] = self.doppler_broadened_spectrum.find_resolution(inputs, offset=inputs['detuning'])
-        new_inputs['resolution'] = 20000
-        new_inputs['span'] = self.elastic_inelastic_intensity.find_border(new_inputs) * 1
+    def grid_spectrum(self, x_values, intensity_error=0.0):
+        """
+        doppler broadened intensity with the analytic convolution without the component store
+        :param x_values: values for the x axis
+        :param intensity_error: intensity error
+        :return: y values
+        """
+        return self.with_broadened_delta(self.broadened_inelastic_intensity(x_values, intensity_error), x_values,
+                                         intensity_error)
 
-        NumbersGraph.update(self, new_inputs)
+    def broadened_inelastic_intensity(self, x_values, intensity_error=0.0):
+        """
+        analytic convolution of the inelastic intensity by the doppler kernel
+        :param x_values: values for the x axis
+        :param intensity_error: intensity error, scalar or array of shape (m,) (one realisation per row)
+        :return: y values, shape (n,) or (m, n)
+        """
+        width = doppler_width(self.temperature * (10 ** -6), math.radians(self.angle))
+        return doppler_broadened_inelastic_intensity(x_values, self.saturation_parameter, self.detuning, self.gamma,
+                                                     self.saturation_intensity, width, intensity_error)
 
-        self.elastic_graph.update_with_random(new_inputs)
-        self.elastic_inelastic_intensity.update_with_random(new_inputs)
-        self.doppler_broadened_spectrum.update(new_inputs)
-        # Inelastic Intensity Convolution
-        self.y_values = signal.convolve(
-            np.array(self.elastic_inelastic_intensity.y_values),
-            self.doppler_broadened_spectrum.y_values,
-            mode='same', method='fft')
-        # normalization
-        self.y_values /= integrate.simpson(self.y_values, self.x_values)
-        self.y_values *= sum(self.elastic_inelastic_intensity.y_values) / sum(self.y_values)
-
-        # adding the convolution of the dirac as the convolution is bilinear
-        convolution_dirac = np.array(self.doppler_broadened_spectrum.y_values) * (
-                self.elastic_graph.value * self.graph_step / integrate.simpson(self.doppler_broadened_spectrum.y_values,
-                                                                               self.x_values))
-
-        self.y_values += convolution_dirac
+    def with_broadened_delta(self, y_values, x_values, intensity_error=0.0):
+        """
+        adds the elastic dirac convolved by the doppler kernel (the dirac stays a dirac if the doppler width is 0)
+        :param y_values: doppler broadened inelastic intensity, shape (n,) or (m, n)
+        :param x_values: values for the x axis
+        :param intensity_error: intensity error, scalar or array of shape (m,) (one realisation per row)
+        :return: y values, shape (n,) or (m, n)
+        """
+        width = doppler_width(self.temperature * (10 ** -6), math.radians(self.angle))
+        if width == 0:
+            return y_values
+        kernel = kernel_backend().doppler_broadened_spectrum(x_values, self.detuning, self.temperature * (10 ** -6),
+                                                             math.radians(self.angle))
+        delta = self.elastic_graph.delta(intensity_error)
+        return y_values + delta.convolve(kernel, width * math.sqrt(2 * math.pi), self.graph_step)
+
+    def delta(self, intensity_error=0.0):
+        """
+        :param intensity_error: intensity error, scalar or array of shape (m,) (one realisation per row)
+        :return: dirac of the elastic intensity if the doppler width is 0 (None otherwise, it is broadened)
+        """
+        if doppler_width(self.temperature * (10 ** -6), math.radians(self.angle)) == 0:
+            return self.elastic_graph.delta(intensity_error)
+        return None
+
+    def convolution_difference(self, inputs):
+        """
+        cross-check of the analytic convolution against the FFT convolution
+        :param inputs: parameters of the graph (GraphParameters or dictionary of inputs)
+        :return: maximum difference between both graphs relative to the maximum of the FFT graph
+        """
+        fft_graph = ElasticInelasticTemperatureIntensity()
+        fft_graph.update(GraphParameters.of(inputs).replace(convolution_method='fft'))
+        analytic_graph = ElasticInelasticTemperatureIntensity()
+        analytic_graph.update(GraphParameters.of(inputs).replace(convolution_method='analytic'))
+        return float(np.max(np.abs(analytic_graph.y_values - fft_graph.y_values)) / np.max(fft_graph.y_values))
@@ -0,0 +1,113 @@
+"""
+frequency grids (x axis) of the graphs
+"""
+from typing import Callable, Dict, Iterable, Tuple
+import math
+import numpy as np
+
+
+def uniform_grid(graph_start: float, graph_end: float, graph_step: float) -> np.ndarray:
+    """
+    builds a regular grid
+    :param graph_start: start of the graph
+    :param graph_end: end of the graph (excluded)
+    :param graph_step: space between 2 numbers on the x axis
+    :return: contiguous float64 array
+    """
+    return np.arange(graph_start, graph_end, graph_step, dtype=float)
+
+
+def quantized_span(span: float, steps_per_octave: int) -> float:
+    """
+    rounds a span up to the next value of a geometric ladder: close spans give the same grid
+    :param span: span (> 0)
+    :param steps_per_octave: number of values of the ladder between a span and twice this span
+    :return: span of the ladder at least equal to span (at most 2 ** (1 / steps_per_octave) times larger)
+    """
+    return 2 ** (math.ceil(math.log2(span) * steps_per_octave - 1e-9) / steps_per_octave)
+
+
+def insert_points(x_values: np.ndarray, points: Iterable[float],
+                  tolerance: float = 0.0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    inserts points in a sorted grid (only if they are not already in it) while keeping it sorted
+    :param x_values: sorted grid
+    :param points: points to insert
+    :param tolerance: a point closer than tolerance to a point of the grid replaces it (a regular grid stays regular
+    when a point differs from a point of the grid by a rounding error)
+    :return: new grid, index of each point in the new grid (same order as points)
+    """
+    x_values = np.array(x_values, dtype=float)
+    points = np.asarray(list(points), dtype=float)
+    new_points = np.unique(points)
+
+    positions = np.searchsorted(x_values, new_points)
+    already_in = np.zeros(len(new_points), dtype=bool)
+    for side in (positions - 1, positions):
+        valid = (0 <= side) & (side < len(x_values))
+        close = np.zeros(len(new_points), dtype=bool)
+        close[valid] = np.abs(x_values[side[valid]] - new_points[valid]) <= tolerance
+        close &= ~already_in
+        x_values[side[close]] = new_points[close]
+        already_in |= close
+    x_values = np.insert(x_values, positions[~already_in], new_points[~already_in])
+
+    return x_values, np.searchsorted(x_values, points)
+
+
+def point_indices(x_values: np.ndarray, points: Iterable[float]) -> Dict[float, int]:
+    """
+    :param x_values: sorted grid containing the points
+    :param points: points of the grid
+    :return: dictionary point -> index of the point in the grid
+    """
+    points = list(points)
+    return dict(zip(points, np.searchsorted(x_values, points).tolist()))
+
+
+def adaptive_grid(function: Callable[[np.ndarray], np.ndarray], graph_start: float, graph_end: float,
+                  features: Iterable[float], feature_width: float, max_points: int, tolerance: float = 1e-3,
+                  min_step: float = 0.0, initial_points: int = 64, feature_points: int = 32) -> np.ndarray:
+    """
+    builds a grid with more points where the function has curvature: an interval is split while the value of the
+    function in its middle is further than tolerance * max|function| from the linear interpolation
+    :param function: vectorized function of the x values
+    :param graph_start: start of the graph
+    :param graph_end: end of the graph
+    :param features: points around which the grid starts dense (detuning, sidebands...)
+    :param feature_width: half width of the dense zone around each feature
+    :param max_points: maximum number of points of the grid
+    :param tolerance: tolerance of the linear interpolation relative to the maximum of the function
+    :param min_step: intervals smaller than min_step are not split
+    :param initial_points: number of points of the initial regular grid
+    :param feature_points: number of points of each dense zone
+    :return: sorted grid
+    """
+    features = list(features)
+    x_values = [np.linspace(graph_start, graph_end, initial_points), features]
+    for feature in features:
+        x_values.append(np.linspace(feature - feature_width, feature + feature_width, feature_points))
+    x_values = np.unique(np.concatenate(x_values))
+    x_values = x_values[(graph_start <= x_values) & (x_values <= graph_end)]
+    y_values = np.asarray(function(x_values), dtype=float)
+
+    pending = np.ones(len(x_values) - 1, dtype=bool)
+    while pending.any() and len(x_values) < max_points:
+        intervals = np.flatnonzero(pending)
+        middles = (x_values[intervals] + x_values[intervals + 1]) / 2
+        y_middles = np.asarray(function(middles), dtype=float)
+
+        error = np.abs(y_middles - (y_values[intervals] + y_values[intervals + 1]) / 2)
+        scale = max(np.max(np.abs(y_values)), np.max(np.abs(y_middles)))
+        split = (error > tolerance * scale) & (x_values[intervals + 1] - x_values[intervals] > 2 * min_step)
+        budget = max_points - len(x_values)
+        if np.count_nonzero(split) > budget:
+            split[np.argsort(np.where(split, error, -1))[:-budget]] = False
+
+        refined = np.zeros(len(pending), dtype=bool)
+        refined[intervals[split]] = True
+        x_values = np.insert(x_values, intervals[split] + 1, middles[split])
+        y_values = np.insert(y_values, intervals[split] + 1, y_middles[split])
+        # both halves of a split interval are tested again
+        pending = np.repeat(refined, 1 + refined)
+    return x_values
@@ -156,6 +156,9 @@ class Ui_MainWindow(object):
         self.generalised_rabi_frequency_label = QtWidgets.QLabel(self.graphparms)
         self.generalised_rabi_frequency_label.setObjectName("generalised_rabi_frequency_label")
         self.formLayout_3.setWidget(6, QtWidgets.QFormLayout.SpanningRole, self.generalised_rabi_frequency_label)
+        self.truncation_error_label = QtWidgets.QLabel(self.graphparms)
+        self.truncation_error_label.setObjectName("truncation_error_label")
+        self.formLayout_3.setWidget(7, QtWidgets.QFormLayout.SpanningRole, self.truncation_error_label)
         self.toolBox.addItem(self.graphparms, "")
         self.temperatureparams = QtWidgets.QWidget()
         self.temperatureparams.setGeometry(QtCore.QRect(0, 0, 380, 514))
@@ -228,6 +231,21 @@ class Ui_MainWindow(object):
         self.laser_intensity_error_uniform_line_edit.setObjectName("laser_intensity_error_uniform_line_edit")
         self.horizontalLayout_27.addWidget(self.laser_intensity_error_uniform_line_edit)
         self.formLayout_2.setLayout(2, QtWidgets.QFormLayout.FieldRole, self.horizontalLayout_27)
+        self.quadrature_averaging_input = QtWidgets.QCheckBox(self.random)
+        self.quadrature_averaging_input.setObjectName("quadrature_averaging_input")
+        self.formLayout_2.setWidget(3, QtWidgets.QFormLayout.SpanningRole, self.quadrature_averaging_input)
+        self.label_50 = QtWidgets.QLabel(self.random)
+        self.label_50.setObjectName("label_50")
+        self.formLayout_2.setWidget(4, QtWidgets.QFormLayout.LabelRole, self.label_50)
+        self.horizontalLayout_29 = QtWidgets.QHBoxLayout()
+        self.horizontalLayout_29.setObjectName("horizontalLayout_29")
+        self.label_51 = QtWidgets.QLabel(self.random)
+        self.label_51.setObjectName("label_51")
+        self.horizontalLayout_29.addWidget(self.label_51)
+        self.laser_intensity_error_quadrature_order_line_edit = QtWidgets.QLineEdit(self.random)
+        self.laser_intensity_error_quadrature_order_line_edit.setObjectName("laser_intensity_error_quadrature_order_line_edit")
+        self.horizontalLayout_29.addWidget(self.laser_intensity_error_quadrature_order_line_edit)
+        self.formLayout_2.setLayout(4, QtWidgets.QFormLayout.FieldRole, self.horizontalLayout_29)
         self.toolBox.addItem(self.random, "")
         self.graph_settings = QtWidgets.QWidget()
         self.graph_settings.setGeometry(QtCore.QRect(0, 0, 380, 514))
@@ -253,6 +271,9 @@ class Ui_MainWindow(object):
         self.show_elastic_inelastic_temperature_intensity = QtWidgets.QCheckBox(self.graph_settings)
         self.show_elastic_inelastic_temperature_intensity.setObjectName("show_elastic_inelastic_temperature_intensity")
         self.formLayout.setWidget(5, QtWidgets.QFormLayout.SpanningRole, self.show_elastic_inelastic_temperature_intensity)
+        self.adaptive_grid_input = QtWidgets.QCheckBox(self.graph_settings)
+        self.adaptive_grid_input.setObjectName("adaptive_grid_input")
+        self.formLayout.setWidget(6, QtWidgets.QFormLayout.SpanningRole, self.adaptive_grid_input)
         self.toolBox.addItem(self.graph_settings, "")
         self.misc = QtWidgets.QWidget()
         self.misc.setGeometry(QtCore.QRect(0, 0, 380, 514))
@@ -274,6 +295,9 @@ class Ui_MainWindow(object):
         self.convolution_kernel = QtWidgets.QCheckBox(self.misc)
         self.convolution_kernel.setObjectName("convolution_kernel")
         self.formLayout_5.setWidget(3, QtWidgets.QFormLayout.SpanningRole, self.convolution_kernel)
+        self.analytic_convolution_input = QtWidgets.QCheckBox(self.misc)
+        self.analytic_convolution_input.setObjectName("analytic_convolution_input")
+        self.formLayout_5.setWidget(4, QtWidgets.QFormLayout.SpanningRole, self.analytic_convolution_input)
         self.label_48 = QtWidgets.QLabel(self.misc)
         self.label_48.setObjectName("label_48")
         self.formLayout_5.setWidget(1, QtWidgets.QFormLayout.LabelRole, self.label_48)
@@ -381,6 +405,10 @@ class Ui_MainWindow(object):
         self.label_24.setText(_translate("MainWindow", "I +-="))
         self.label.setText(_translate("MainWindow", "Intensity error uniform"))
         self.label_47.setText(_translate("MainWindow", "I +-="))
+        self.quadrature_averaging_input.setToolTip(_translate("MainWindow", "<html><head/><body><p>Average over the intensity error with Gauss–Hermite × Gauss–Legendre quadrature instead of random realisations</p></body></html>"))
+        self.quadrature_averaging_input.setText(_translate("MainWindow", "Quadrature averaging"))
+        self.label_50.setText(_translate("MainWindow", "Quadrature order"))
+        self.label_51.setText(_translate("MainWindow", "n = "))
         self.toolBox.setItemText(self.toolBox.indexOf(self.random), _translate("MainWindow", "Intensity Variation"))
         self.center_on_detuning_input.setText(_translate("MainWindow", "Center on detuning"))
         self.show_annotations_input.setText(_translate("MainWindow", "Annotations"))
@@ -388,11 +416,15 @@ class Ui_MainWindow(object):
         self.show_inelastic_intensity.setText(_translate("MainWindow", "Inelastic Intensity"))
         self.show_elastic_inelastic_intensity.setText(_translate("MainWindow", "Inelastic + Elastic Intensity"))
         self.show_elastic_inelastic_temperature_intensity.setText(_translate("MainWindow", "Inelastic + Elastic intensity + Temperature"))
+        self.adaptive_grid_input.setToolTip(_translate("MainWindow", "<html><head/><body><p>Non-uniform grid with more points where the spectrum has curvature, the graphic resolution is then the maximum number of points (the temperature graph needs the analytic doppler convolution)</p></body></html>"))
+        self.adaptive_grid_input.setText(_translate("MainWindow", "Adaptive grid"))
         self.toolBox.setItemText(self.toolBox.indexOf(self.graph_settings), _translate("MainWindow", "Graph Settings"))
         self.label_6.setText(_translate("MainWindow", "Saturation I"))
         self.label_14.setText(_translate("MainWindow", "<html><head/><body><p>I<span style=\" vertical-align:sub;\">sat</span>(mW/cm^2)=</p></body></html>"))
         self.saturation_i_line_edit.setText(_translate("MainWindow", "1.669"))
         self.convolution_kernel.setText(_translate("MainWindow", "debug(only) show convolution kernel"))
+        self.analytic_convolution_input.setToolTip(_translate("MainWindow", "<html><head/><body><p>Compute the doppler broadening with the Faddeeva function instead of a FFT convolution</p></body></html>"))
+        self.analytic_convolution_input.setText(_translate("MainWindow", "Analytic doppler convolution"))
         self.label_48.setText(_translate("MainWindow", "random resolution"))
         self.label_49.setText(_translate("MainWindow", "n = "))
         self.toolBox.setItemText(self.toolBox.indexOf(self.misc), _translate("MainWindow", "Misc"))
@@ -7,6 +7,7 @@ from matplotlib.backends.backend_qt5agg import FigureCanvas
 
 from matplotlib.figure import Figure
 import matplotlib as mpl
+from modules.decimation import min_max_decimation, band_decimation
 
 
 class MplWidget(QWidget):
@@ -25,3 +26,188 @@ class MplWidget(QWidget):
 
         self.setLayout(vertical_layout)
 
+        # persistent artists, updated in place instead of being created again at each redraw
+        self.lines = {}
+        self.bands = {}
+        # dirac of each graph drawn as a stem with a marker on its top
+        self.stems = {}
+        # full resolution values of the lines, the lines only show a few points per pixel of the view
+        self.data = {}
+        # full resolution edges and color of the bands, the bands only show the envelope of each pixel column
+        self.band_data = {}
+        # artists shown in the legend (the legend is made again only when they change)
+        self.legend_handles = None
+        self.annotation_line = None
+        self.annotation_text = None
+        self.style_axes(color)
+        # the level of detail is computed again when the view changes (zoom and pan of the toolbar, resize)
+        self.canvas.axes.callbacks.connect('xlim_changed', lambda axes: self.decimate())
+        self.canvas.mpl_connect('resize_event', lambda event: self.decimate())
+
+    def style_axes(self, color):
+        """
+        grid, title, labels and spines of the axes (done once)
+        :param color: color of the hidden spines
+        """
+        axes = self.canvas.axes
+        axes.grid(color='#4f5b62', linestyle='--', linewidth=0.5)
+        axes.set_title('Spectrum of light scattered by a quantum two-level system', fontsize=20, pad=20)
+        axes.set_xlabel('$(ω - ω_{at})/Γ$')
+        axes.set_ylabel('Spectrum')
+        axes.spines['right'].set_color(color)
+        axes.spines['top'].set_color(color)
+
+    def update_lines(self, results):
+        """
+        updates the line (the standard error band and the dirac) of each graph, lines of the graphs which are not in
+        results are hidden
+        :param results: values of the graphs (List[GraphResult])
+        """
+        axes = self.canvas.axes
+        names = [graph.name for graph in results]
+        for name, line in self.lines.items():
+            if name not in names:
+                line.set_visible(False)
+                self.data.pop(name, None)
+        for name, band in self.bands.items():
+            if name not in names:
+                band.set_visible(False)
+                self.band_data.pop(name, None)
+        for name, stem in self.stems.items():
+            if name not in names:
+                stem.set_visible(False)
+
+        for graph in results:
+            line = self.lines.get(graph.name)
+            if line is None:
+                line, = axes.plot(graph.x_values, graph.y_values, label=graph.name, color=graph.color)
+                self.lines[graph.name] = line
+            else:
+                # full resolution until the limits are updated (the y limits are computed from all the points)
+                line.set_data(graph.x_values, graph.y_values)
+                line.set_color(graph.color)
+                line.set_visible(True)
+            self.data[graph.name] = (graph.x_values, graph.y_values)
+            self.update_band(graph)
+            self.update_stem(graph)
+
+        # a graph made only of a dirac (empty line) is shown by its stem
+        handles = [self.stems[graph.name] if len(graph.x_values) == 0 and graph.name in self.stems and
+                   self.stems[graph.name].get_visible() else self.lines[graph.name] for graph in results]
+        if handles != self.legend_handles:
+            axes.legend(handles=handles, loc='upper right')
+            self.legend_handles = handles
+
+    def update_band(self, graph):
+        """
+        updates the standard error band of a graph (hidden when the graph has no standard error)
+        :param graph: values of the graph (GraphResult)
+        """
+        band = self.bands.get(graph.name)
+        if graph.y_standard_error is None:
+            if band is not None:
+                band.set_visible(False)
+            self.band_data.pop(graph.name, None)
+            return
+        y_low = graph.y_values - graph.y_standard_error
+        y_high = graph.y_values + graph.y_standard_error
+        self.band_data[graph.name] = (graph.x_values, y_low, y_high, graph.color)
+        # envelope of the whole graph until the limits are updated (the y limits are computed from the band)
+        x_min, x_max = (graph.x_values[0], graph.x_values[-1]) if len(graph.x_values) else (0, 1)
+        self.set_band(graph.name, *band_decimation(graph.x_values, y_low, y_high, x_min, x_max,
+                                                   int(self.canvas.axes.bbox.width)))
+
+    def set_band(self, name, x_values, y_low, y_high):
+        """
+        replaces the points of a band (shown)
+        :param name: name of the graph of the band
+        :param x_values: x values of the band
+        :param y_low: lower edge of the band
+        :param y_high: upper edge of the band
+        """
+        band = self.bands.get(name)
+        if band is not None and hasattr(band, 'set_data'):
+            band.set_data(x_values, y_low, y_high)
+            band.set_visible(True)
+        else:
+            # older matplotlib: the band can not be updated in place
+            if band is not None:
+                band.remove()
+            self.bands[name] = self.canvas.axes.fill_between(x_values, y_low, y_high, color=self.band_data[name][3],
+                                                             alpha=0.3, linewidth=0)
+
+    def update_stem(self, graph):
+        """
+        updates the stem of the dirac of a graph (hidden when the graph has no dirac)
+        :param graph: values of the graph (GraphResult)
+        """
+        stem = self.stems.get(graph.name)
+        delta = getattr(graph, 'spectral_delta', None)
+        if delta is None:
+            if stem is not None:
+                stem.set_visible(False)
+            return
+        x_values, y_values = [delta.position, delta.position], [0, delta.weight]
+        if stem is None:
+            # the marker is only on the top of the stem
+            stem, = self.canvas.axes.plot(x_values, y_values, label=graph.name, color=graph.color, marker='o',
+                                          markevery=[1])
+            self.stems[graph.name] = stem
+        else:
+            stem.set_data(x_values, y_values)
+            stem.set_color(graph.color)
+            stem.set_visible(True)
+
+    def update_annotation(self, visible, x, line_color, box_color):
+        """
+        shows (or hides) the dashed line and the label of the detuning
+        :param visible: annotation shown
+        :param x: detuning
+        :param line_color: color of the dashed line
+        :param box_color: color of the box of the label
+        """
+        axes = self.canvas.axes
+        if self.annotation_line is None:
+            self.annotation_line = axes.axvline(x, ls='--', color=line_color)
+            self.annotation_text = axes.text(x, 0, r"$Δ/Γ$", fontsize=14, verticalalignment='top',
+                                             horizontalalignment='center',
+                                             bbox=dict(boxstyle='round', facecolor=box_color, alpha=1))
+        self.annotation_line.set_xdata([x, x])
+        self.annotation_text.set_x(x)
+        self.annotation_line.set_visible(visible)
+        self.annotation_text.set_visible(visible)
+
+    def update_limits(self, x_min, x_max):
+        """
+        x limits of the graph, y limits fitted to the visible lines (from 0)
+        :param x_min: start of the graph
+        :param x_max: end of the graph
+        """
+        axes = self.canvas.axes
+        axes.relim(visible_only=True)
+        for band in self.bands.values():
+            if band.get_visible():
+                axes.update_datalim(band.get_datalim(axes.transData))
+        axes.autoscale(enable=True, axis='y')
+        axes.set_ylim(bottom=0)
+        axes.set_xlim([x_min, x_max])
+        self.decimate()
+
+    def decimate(self):
+        """
+        keeps the points of minimum and maximum of each pixel column of the view in the lines and the envelope of each
+        pixel column in the bands
+        """
+        axes = self.canvas.axes
+        x_min, x_max = sorted(axes.get_xlim())
+        pixels = int(axes.bbox.width)
+        for name, (x_values, y_values) in self.data.items():
+            self.lines[name].set_data(*min_max_decimation(x_values, y_values, x_min, x_max, pixels))
+        for name, (x_values, y_low, y_high, _) in list(self.band_data.items()):
+            self.set_band(name, *band_decimation(x_values, y_low, y_high, x_min, x_max, pixels))
+
+    def redraw(self):
+        """
+        redraws the canvas when Qt is idle
+        """
+        self.canvas.draw_idle()
@@ -0,0 +1,32 @@
+"""
+kernel of the numba backend (modules.backends): the inelastic intensity in one fused parallel loop, compiled on the
+first call and cached next to this file. This module is only imported when numba is installed
+"""
+import math
+import numba
+
+
+@numba.njit(parallel=True, cache=True)
+def inelastic_intensity_loop(w, s, detuning, gamma, out):
+    """
+    inelastic intensity (formula of modules.functions.inelastic_intensity_array) without temporaries
+    :param w: frequencies of the atom, shape (n,)
+    :param s: saturation parameters with the intensity error, shape (m,)
+    :param detuning: detuning
+    :param gamma: default at 1
+    :param out: inelastic intensity, shape (m, n) (written)
+    """
+    m, n = out.shape
+    d_l_g_b = (detuning / gamma) ** 2
+    for index in numba.prange(m * n):
+        i = index // n
+        j = index - i * n
+        s_i = s[i]
+        d_g_b = ((w[j] - detuning) / gamma) ** 2  # δ = ω − ωL.
+        first_second_part = (1 / gamma) * (s_i ** 2) / (8 * math.pi * (1 + s_i + 4 * d_l_g_b))
+        numerator_big_part = d_g_b + 1 + s_i / 4
+        denominator_big_part1 = (1 / 4) + d_l_g_b - 2 * d_g_b + s_i / 4
+        denominator_big_part2 = (5 / 4) + d_l_g_b - d_g_b + s_i / 2
+        out[i, j] = first_second_part * numerator_big_part / (
+                denominator_big_part1 ** 2 + d_g_b * denominator_big_part2 ** 2)
+
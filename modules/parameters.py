@@ -0,0 +1,227 @@
+"""
+immutable inputs of the graphs: a graph is computed only from a GraphParameters, so graphs with different parameters can
+be computed at the same time (threads, processes) and the parameters can be used as a cache key
+"""
+from typing import Any, Dict, Optional, Tuple, Union
+import math
+from modules.functions import laser_intensity_from_laser_waist_laser_power, \
+    saturation_parameter_from_laser_intensity, saturation_parameter_from_rabi_frequency, \
+    rabi_frequency_from_saturation_parameter
+
+# default value of each input
+DEFAULTS: Dict[str, Any] = {
+    # resolution of the graph
+    'resolution': 2000,
+    # offset of the graph mainly used to center on detuning or to center on 0
+    'offset': 0.0,
+    # span of the graph
+    'span': 10.0,
+    # non-uniform grid with more points where the spectrum has curvature (resolution is then a maximum)
+    'adaptive_grid': False,
+    # on-resonance saturation parameter
+    'saturation_parameter': 1.0,
+    'saturation_intensity': 1.669,
+    # laser frequency-atom frequency
+    'detuning': 0.0,
+    'gamma': 1.0,
+    'angle': 90.0,
+    'temperature': 100.0,
+    'laser_intensity_error_mu': 0.0,
+    'laser_intensity_error_sigma': 0.0,
+    'laser_intensity_error_uniform': 0.0,
+    # number of realisations of the intensity error
+    'laser_intensity_error_random_resolution': 30,
+    # seed of the random generator of the intensity error (None: new realisations on every update)
+    'laser_intensity_error_seed': None,
+    # averaging over the intensity error: 'monte_carlo' (random realisations) or 'quadrature'
+    'laser_intensity_error_averaging': 'monte_carlo',
+    # number of quadrature nodes per distribution of the intensity error
+    'laser_intensity_error_quadrature_order': 4,
+    # convolution by the doppler kernel: 'fft' (numerical) or 'analytic' (Faddeeva function)
+    'convolution_method': 'fft',
+    # resolution of the doppler broadened graph (the resolution of the other graphs is not used)
+    'temperature_resolution': 20000,
+}
+# inputs the saturation parameter can be derived from, by priority
+SATURATION_SOURCES = ('rabi_frequency', 'saturation_parameter', 'laser_intensity', 'laser_power')
+FLOAT_FIELDS = ('offset', 'span', 'saturation_parameter', 'saturation_intensity', 'detuning', 'gamma', 'angle',
+                'temperature', 'laser_intensity_error_mu', 'laser_intensity_error_sigma',
+                'laser_intensity_error_uniform')
+INTEGER_FIELDS = ('resolution', 'laser_intensity_error_random_resolution', 'laser_intensity_error_quadrature_order',
+                  'temperature_resolution')
+# inputs of the averaging over the intensity error, by averaging method
+AVERAGING_FIELDS = {
+    'monte_carlo': ('laser_intensity_error_mu', 'laser_intensity_error_sigma', 'laser_intensity_error_uniform',
+                    'laser_intensity_error_random_resolution', 'laser_intensity_error_seed'),
+    'quadrature': ('laser_intensity_error_mu', 'laser_intensity_error_sigma', 'laser_intensity_error_uniform',
+                   'laser_intensity_error_quadrature_order'),
+}
+CHOICES = {
+    'laser_intensity_error_averaging': ('monte_carlo', 'quadrature'),
+    'convolution_method': ('fft', 'analytic'),
+}
+
+
+class GraphParameters:
+    """
+    frozen inputs of the graphs, the saturation parameter, the rabi frequency and the laser intensity are derived from
+    the first given of rabi_frequency, saturation_parameter, laser_intensity or laser_power and laser_waist (kept in
+    saturation_source)
+    """
+    __slots__ = tuple(DEFAULTS) + ('rabi_frequency', 'laser_intensity', 'laser_power', 'laser_waist',
+                                   'saturation_source')
+
+    def __init__(self, rabi_frequency: Optional[float] = None, laser_intensity: Optional[float] = None,
+                 laser_power: Optional[float] = None, laser_waist: Optional[float] = None, **inputs):
+        """
+        :param rabi_frequency: rabi frequency (the saturation parameter is derived from it)
+        :param laser_intensity: laser intensity (the saturation parameter is derived from it)
+        :param laser_power: laser power (the laser intensity is derived from it and from the laser waist)
+        :param laser_waist: laser waist
+        :param inputs: other inputs (keys of DEFAULTS), the missing ones have their default value
+        :raise TypeError: if an input is unknown
+        :raise ValueError: if an input is not valid
+        """
+        unknown = set(inputs) - set(DEFAULTS)
+        if unknown:
+            raise TypeError('unknown inputs: ' + ', '.join(sorted(unknown)))
+        values = dict(DEFAULTS, **inputs)
+        for name in FLOAT_FIELDS:
+            values[name] = float(values[name])
+        for name in INTEGER_FIELDS:
+            values[name] = int(values[name])
+        values['adaptive_grid'] = bool(values['adaptive_grid'])
+
+        saturation_intensity = values['saturation_intensity']
+        if saturation_intensity <= 0:
+            raise ValueError('the saturation intensity must be positive')
+        values['saturation_source'] = 'saturation_parameter'
+        if rabi_frequency is not None:
+            values['saturation_parameter'] = saturation_parameter_from_rabi_frequency(float(rabi_frequency))
+            values['saturation_source'] = 'rabi_frequency'
+        elif 'saturation_parameter' not in inputs:
+            if laser_intensity is None and laser_power is not None:
+                if laser_waist is None or laser_waist <= 0:
+                    raise ValueError('the laser waist must be positive to calculate the laser intensity')
+                laser_intensity = laser_intensity_from_laser_waist_laser_power(laser_waist, laser_power)
+                values['saturation_source'] = 'laser_power'
+            elif laser_intensity is not None:
+                values['saturation_source'] = 'laser_intensity'
+            if laser_intensity is not None:
+                values['saturation_parameter'] = saturation_parameter_from_laser_intensity(float(laser_intensity),
+                                                                                          saturation_intensity)
+        if not values['saturation_parameter'] >= 0:
+            raise ValueError('the saturation parameter must be positive or zero')
+        values['rabi_frequency'] = rabi_frequency_from_saturation_parameter(values['saturation_parameter'])
+        values['laser_intensity'] = values['saturation_parameter'] * saturation_intensity
+        values['laser_power'] = None if laser_power is None else float(laser_power)
+        values['laser_waist'] = None if laser_waist is None else float(laser_waist)
+        validate(values)
+        for name in self.__slots__:
+            object.__setattr__(self, name, values[name])
+
+    @classmethod
+    def of(cls, inputs: Union['GraphParameters', Dict[str, Any]]) -> 'GraphParameters':
+        """
+        :param inputs: parameters or dictionary of inputs
+        :return: parameters
+        """
+        return inputs if isinstance(inputs, cls) else cls(**inputs)
+
+    def replace(self, **changes) -> 'GraphParameters':
+        """
+        :param changes: new values of some inputs (a new rabi frequency, laser intensity or laser power replaces the
+        saturation parameter, a new saturation intensity changes the saturation parameter derived from the laser
+        intensity or the laser power as in the interface)
+        :return: copy of the parameters with the changes (the other fields, laser power and waist included, are kept)
+        """
+        inputs = self.as_dict()
+        # the derived fields are computed again from the saturation parameter, or from the changed source
+        source = inputs.pop('saturation_source')
+        inputs.pop('rabi_frequency')
+        laser_intensity = inputs.pop('laser_intensity')
+        changed_source = any(name in changes for name in SATURATION_SOURCES if name != 'saturation_parameter') or \
+            ('laser_waist' in changes and inputs['laser_power'] is not None)
+        if 'saturation_parameter' not in changes:
+            if changed_source or ('saturation_intensity' in changes and source == 'laser_power'):
+                inputs.pop('saturation_parameter')
+            elif 'saturation_intensity' in changes and source == 'laser_intensity':
+                inputs.pop('saturation_parameter')
+                inputs['laser_intensity'] = laser_intensity
+        inputs.update(changes)
+        parameters = GraphParameters(**inputs)
+        if 'saturation_parameter' in inputs and 'saturation_parameter' not in changes:
+            # the saturation parameter is kept, and so is the input it was derived from
+            object.__setattr__(parameters, 'saturation_source', source)
+        return parameters
+
+    def as_dict(self) -> Dict[str, Any]:
+        """
+        :return: dictionary of the inputs and of the derived values
+        """
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @property
+    def with_random(self) -> bool:
+        """the graphs are averaged over the intensity error"""
+        return self.laser_intensity_error_sigma != 0 or self.laser_intensity_error_mu != 0 or \
+            self.laser_intensity_error_uniform != 0
+
+    def values(self) -> Tuple[Any, ...]:
+        """
+        :return: values of all the fields (in the order of __slots__)
+        """
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'GraphParameters is immutable, use replace({name}=...)')
+
+    def __delattr__(self, name):
+        raise AttributeError('GraphParameters is immutable')
+
+    def __eq__(self, other):
+        return isinstance(other, GraphParameters) and self.values() == other.values()
+
+    def __hash__(self):
+        return hash(self.values())
+
+    def __repr__(self):
+        return 'GraphParameters(' + ', '.join(f'{name}={value!r}' for name, value in self.as_dict().items()) + ')'
+
+    def __reduce__(self):
+        # pickled (sent to another process) as the values of its fields
+        return restore, (self.as_dict(),)
+
+
+def restore(fields: Dict[str, Any]) -> GraphParameters:
+    """
+    :param fields: values of all the fields of a GraphParameters (already validated)
+    :return: parameters
+    """
+    parameters = object.__new__(GraphParameters)
+    for name, value in fields.items():
+        object.__setattr__(parameters, name, value)
+    return parameters
+
+
+def validate(values: Dict[str, Any]) -> None:
+    """
+    :param values: values of the fields of a GraphParameters
+    :raise ValueError: if a value is not valid
+    """
+    for name in FLOAT_FIELDS:
+        if not math.isfinite(values[name]):
+            raise ValueError(f'{name} must be a finite number')
+    for name in ('span', 'gamma'):
+        if values[name] <= 0:
+            raise ValueError(f'{name} must be positive')
+    for name in ('temperature', 'laser_intensity_error_sigma', 'laser_intensity_error_uniform',
+                 'laser_intensity_error_random_resolution'):
+        if values[name] < 0:
+            raise ValueError(f'{name} must be positive or zero')
+    for name in ('resolution', 'temperature_resolution', 'laser_intensity_error_quadrature_order'):
+        if values[name] < 1:
+            raise ValueError(f'{name} must be at least 1')
+    for name, choices in CHOICES.items():
+        if values[name] not in choices:
+            raise ValueError(f'{name} must be one of ' + ', '.join(choices))
@@ -0,0 +1,69 @@
+"""
+memoization of the values of the graphs, keyed by the parameters each graph class depends on
+"""
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Union
+import threading
+from modules.parameters import GraphParameters, AVERAGING_FIELDS
+
+
+class ResultCache:
+    """bounded LRU cache of graph results (GraphResult), the total size of their arrays stays under max_bytes"""
+
+    def __init__(self, max_bytes: int = 256 * 2 ** 20):
+        """
+        :param max_bytes: maximum total size in bytes of the arrays of the cached results
+        """
+        self.max_bytes = max_bytes
+        self.results = OrderedDict()
+        self.bytes = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(graph, inputs: Union[GraphParameters, Dict[str, Any]], with_random: bool) -> Optional[Hashable]:
+        """
+        :param graph: graph (NumbersGraph)
+        :param inputs: parameters of the graph
+        :param with_random: graph updated with the intensity error
+        :return: class of the graph and the values of the inputs it depends on (its dependencies, its grid fields and
+        the inputs of the averaging with the intensity error), None if the result can not be reused (new random
+        realisations on every update)
+        """
+        parameters = GraphParameters.of(inputs)
+        averaging = parameters.laser_intensity_error_averaging
+        if with_random and averaging != 'quadrature' and parameters.laser_intensity_error_seed is None:
+            return None
+        fields = graph.dependencies + graph.grid_fields
+        if with_random:
+            fields += ('laser_intensity_error_averaging',) + AVERAGING_FIELDS[averaging]
+        return type(graph).__name__, with_random, tuple(getattr(parameters, name) for name in fields)
+
+    def get(self, key: Optional[Hashable]):
+        """
+        :param key: key of the result
+        :return: cached result, None if it is not in the cache
+        """
+        if key is None:
+            return None
+        with self.lock:
+            result = self.results.get(key)
+            if result is not None:
+                self.results.move_to_end(key)
+            return result
+
+    def put(self, key: Optional[Hashable], result) -> None:
+        """
+        adds a result to the cache, the least recently used results are removed to stay under max_bytes
+        :param key: key of the result
+        :param result: result (GraphResult)
+        """
+        if key is None or result.nbytes > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.results:
+                self.bytes -= self.results.pop(key).nbytes
+            self.results[key] = result
+            self.bytes += result.nbytes
+            while self.bytes > self.max_bytes:
+                _, removed = self.results.popitem(last=False)
+                self.bytes -= removed.nbytes
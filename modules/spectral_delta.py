@@ -0,0 +1,50 @@
+"""
+dirac part of a spectrum (the elastic intensity) kept as a position and a weight instead of a value on the grid
+"""
+from typing import Optional
+import math
+import numpy as np
+
+
+class SpectralDelta:
+    """dirac of a spectrum: weight * δ(x - position)"""
+
+    def __init__(self, position: float, weight):
+        """
+        :param position: x value of the dirac
+        :param weight: height of the dirac (the value it would have on its grid point), scalar or array of shape (m,)
+        (one realisation of the intensity error per row)
+        """
+        self.position = float(position)
+        self.weight = float(weight) if np.ndim(weight) == 0 else weight
+
+    def __repr__(self):
+        return f'SpectralDelta(position={self.position!r}, weight={self.weight!r})'
+
+    def mean(self, weights: np.ndarray) -> 'SpectralDelta':
+        """
+        :param weights: weights of the mean over the realisations, shape (m,)
+        :return: dirac of weight the mean of the weights of the realisations
+        """
+        return SpectralDelta(self.position, float(weights @ np.asarray(self.weight, dtype=float)))
+
+    def convolve(self, kernel: np.ndarray, kernel_integral: float, step: float) -> np.ndarray:
+        """
+        convolution by a kernel sampled on a regular grid and centered on the position of the dirac: the kernel shifted
+        on the dirac and scaled by its weight (the dirac covers one step of the grid)
+        :param kernel: kernel centered on the position, shape (n,)
+        :param kernel_integral: integral of the kernel
+        :param step: step of the grid
+        :return: convolution, shape (n,) or (m, n)
+        """
+        return np.multiply.outer(np.asarray(self.weight, dtype=float) * (step / kernel_integral), kernel)
+
+
+def delta_values(delta: Optional[SpectralDelta]):
+    """
+    :param delta: dirac of a spectrum (None if the spectrum has no dirac)
+    :return: position and weight of the dirac (nan if there is no dirac)
+    """
+    if delta is None:
+        return math.nan, math.nan
+    return delta.position, float(delta.weight)
@@ -0,0 +1,181 @@
+"""
+on-disk store of many spectra: a directory of memory-mapped .npy files
+
+    parameters.npy        structured array, one row per spectrum (inputs of the spectrum, its dirac, the truncation
+                          error of its doppler kernel and its length)
+    x_values.npy          float64 array of shape (rows, columns)
+    y_values.npy          float64 array of shape (rows, columns)
+    y_standard_error.npy  float64 array of shape (rows, columns) (nan without Monte Carlo averaging)
+
+a spectrum shorter than columns is padded with nan, a row of length -1 is not written yet (a spectrum made only of
+a dirac has length 0). The rows are reserved when the store is created so processes can write different rows at the
+same time (the rows are shared through the page cache, flush writes them to the disk once all the rows are written),
+and a row is read from the disk only when it is loaded.
+"""
+from typing import Dict, Iterable, Optional
+import os
+import numpy as np
+from modules.spectral_delta import SpectralDelta, delta_values
+
+ARRAYS = ('x_values', 'y_values', 'y_standard_error')
+# columns of the parameter table which are not inputs: position and weight of the dirac (nan without dirac), truncation
+# error of the doppler kernel (nan without doppler convolution), length
+SPECTRUM_FIELDS = ('delta_position', 'delta_weight', 'truncation_error', 'length')
+
+
+class StoredSpectrum:
+    """spectrum loaded from a store (same attributes as the results drawn by the plot widget)"""
+
+    def __init__(self, name, color, x_values, y_values, y_standard_error=None, spectral_delta=None,
+                 truncation_error=None):
+        """
+        :param name: label of the spectrum
+        :param color: color of the line
+        :param x_values: x values
+        :param y_values: y values
+        :param y_standard_error: standard error of the y values (None if unknown)
+        :param spectral_delta: dirac of the spectrum (None if the spectrum has no dirac)
+        :param truncation_error: truncation error of the doppler kernel (None without doppler convolution)
+        """
+        self.name = name
+        self.color = color
+        self.x_values = x_values
+        self.y_values = y_values
+        self.y_standard_error = y_standard_error
+        self.spectral_delta = spectral_delta
+        self.truncation_error = truncation_error
+
+    @property
+    def nbytes(self) -> int:
+        """size in bytes of the arrays of the spectrum"""
+        return self.x_values.nbytes + self.y_values.nbytes + \
+            (0 if self.y_standard_error is None else self.y_standard_error.nbytes)
+
+
+class SpectrumStore:
+    """memory-mapped store of spectra with a parameter table"""
+
+    def __init__(self, path: str, mode: str = 'r'):
+        """
+        opens an existing store (nothing is read before a row is loaded)
+        :param path: directory of the store
+        :param mode: 'r' (read only) or 'r+' (rows can be written)
+        """
+        self.path = path
+        self.mode = mode
+        self.parameters = np.load(os.path.join(path, 'parameters.npy'), mmap_mode=mode)
+        self.arrays = {name: np.load(os.path.join(path, name + '.npy'), mmap_mode=mode) for name in ARRAYS}
+
+    @classmethod
+    def create(cls, path: str, parameter_names: Iterable[str], rows: int, columns: int) -> 'SpectrumStore':
+        """
+        creates an empty store
+        :param path: directory of the store (created if needed)
+        :param parameter_names: names of the inputs kept in the parameter table
+        :param rows: number of spectra
+        :param columns: maximum length of a spectrum
+        :return: store opened in 'r+' mode
+        """
+        os.makedirs(path, exist_ok=True)
+        dtype = [(name, float) for name in parameter_names] + \
+            [('delta_position', float), ('delta_weight', float), ('truncation_error', float), ('length', np.int64)]
+        parameters = np.lib.format.open_memmap(os.path.join(path, 'parameters.npy'), 'w+', dtype, (rows,))
+        parameters['delta_position'] = np.nan
+        parameters['delta_weight'] = np.nan
+        parameters['truncation_error'] = np.nan
+        parameters['length'] = -1
+        parameters.flush()
+        for name in ARRAYS:
+            array = np.lib.format.open_memmap(os.path.join(path, name + '.npy'), 'w+', float, (rows, columns))
+            array[:] = np.nan
+            array.flush()
+        return cls(path, 'r+')
+
+    @property
+    def rows(self) -> int:
+        """number of spectra"""
+        return len(self.parameters)
+
+    @property
+    def columns(self) -> int:
+        """maximum length of a spectrum"""
+        return self.arrays['x_values'].shape[1]
+
+    @property
+    def parameter_names(self):
+        """names of the inputs of the parameter table"""
+        return [name for name in self.parameters.dtype.names if name not in SPECTRUM_FIELDS]
+
+    def written(self, row: int) -> bool:
+        """
+        :param row: row of a spectrum
+        :return: the spectrum of the row is written
+        """
+        return int(self.parameters['length'][row]) >= 0
+
+    def write(self, row: int, parameters: Dict[str, float], x_values: np.ndarray, y_values: np.ndarray,
+              y_standard_error: Optional[np.ndarray] = None, spectral_delta: Optional[SpectralDelta] = None,
+              truncation_error: Optional[float] = None) -> None:
+        """
+        writes one spectrum (several processes can write different rows of the same store), the row is written to the
+        disk by flush
+        :param row: row of the spectrum
+        :param parameters: inputs of the spectrum (values of the parameter table)
+        :param x_values: x values
+        :param y_values: y values
+        :param y_standard_error: standard error of the y values
+        :param spectral_delta: dirac of the spectrum
+        :param truncation_error: truncation error of the doppler kernel
+        """
+        length = len(x_values)
+        if length > self.columns:
+            raise ValueError(f'spectrum of {length} points longer than the {self.columns} columns of the store')
+        for name, values in zip(ARRAYS, (x_values, y_values, y_standard_error)):
+            if values is not None:
+                self.arrays[name][row, :length] = values
+        for name in self.parameter_names:
+            self.parameters[name][row] = parameters.get(name, np.nan)
+        self.parameters['delta_position'][row], self.parameters['delta_weight'][row] = delta_values(spectral_delta)
+        if 'truncation_error' in self.parameters.dtype.names:
+            self.parameters['truncation_error'][row] = np.nan if truncation_error is None else truncation_error
+        # the length is written last: a row of length -1 is not complete
+        self.parameters['length'][row] = length
+
+    def flush(self) -> None:
+        """
+        writes the rows written by any process to the disk (once per sweep: each flush writes the whole files)
+        """
+        for array in self.arrays.values():
+            array.flush()
+        self.parameters.flush()
+
+    def load(self, row: int, name: Optional[str] = None, color: str = 'white') -> StoredSpectrum:
+        """
+        reads one spectrum from the disk
+        :param row: row of the spectrum
+        :param name: label of the spectrum (default: its parameters)
+        :param color: color of the line
+        :return: spectrum
+        """
+        length = max(int(self.parameters['length'][row]), 0)
+        x_values, y_values, y_standard_error = (np.array(self.arrays[array][row, :length]) for array in ARRAYS)
+        if np.all(np.isnan(y_standard_error)):
+            y_standard_error = None
+        if name is None:
+            name = self.describe(row)
+        spectral_delta = None
+        if 'delta_weight' in self.parameters.dtype.names and not np.isnan(self.parameters['delta_weight'][row]):
+            spectral_delta = SpectralDelta(self.parameters['delta_position'][row], self.parameters['delta_weight'][row])
+        truncation_error = None
+        if 'truncation_error' in self.parameters.dtype.names and \
+                not np.isnan(self.parameters['truncation_error'][row]):
+            truncation_error = float(self.parameters['truncation_error'][row])
+        return StoredSpectrum(name, color, x_values, y_values, y_standard_error, spectral_delta, truncation_error)
+
+    def describe(self, row: int) -> str:
+        """
+        :param row: row of a spectrum
+        :return: row and parameters of the spectrum
+        """
+        entry = self.parameters[row]
+        return f'{row}: ' + ', '.join(f'{name}={entry[name]:g}' for name in self.parameter_names)
@@ -0,0 +1,43 @@
+"""
+time spent by each step of the startup of the app (python main.py --profile-startup)
+"""
+from typing import List, Tuple
+import time
+
+
+class StartupProfile:
+    """timestamps of the steps of the startup"""
+
+    def __init__(self, start: float):
+        """
+        :param start: time.perf_counter() at the start of the program
+        """
+        self.start = start
+        self.marks: List[Tuple[str, float]] = []
+
+    def mark(self, step: str) -> None:
+        """
+        records the end of a step
+        :param step: name of the step
+        """
+        self.marks.append((step, time.perf_counter()))
+
+    def total(self) -> float:
+        """
+        :return: time in seconds from the start to the last step
+        """
+        return (self.marks[-1][1] if self.marks else time.perf_counter()) - self.start
+
+    def report(self) -> str:
+        """
+        :return: duration of each step and its share of the startup
+        """
+        total = max(self.total(), 1e-9)
+        lines = []
+        previous = self.start
+        for step, timestamp in self.marks:
+            duration = timestamp - previous
+            lines.append(f'{step:<36}{duration * 1000:9.1f} ms {100 * duration / total:5.1f} %')
+            previous = timestamp
+        lines.append(f'{"total":<36}{total * 1000:9.1f} ms')
+        return '\n'.join(lines)
@@ -0,0 +1,218 @@
+"""
+headless computation of the graphs over a grid of parameters (no PyQt needed)
+
+    python -m modules.sweep --graph intensity --saturation-parameter 0.1:10:50 --detuning 0 1 2 --output sweep.npz
+
+a parameter is given as a list of values or as start:stop:number (evenly spaced values), the sweep is the cartesian
+product of the parameters, the points are computed by a pool of processes. With --store DIRECTORY, each process writes
+its spectra directly into a memory-mapped SpectrumStore instead of sending them back to a single npz file.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+import argparse
+import itertools
+import os
+import time
+import numpy as np
+from modules.graph_classes import InelasticIntensity, ElasticIntensity, Intensity, DopplerBroadenedSpectrum, \
+    ElasticInelasticTemperatureIntensity
+from modules.spectrum_store import SpectrumStore
+from modules.spectral_delta import SpectralDelta, delta_values
+from modules.parameters import GraphParameters, DEFAULTS
+
+GRAPHS = {
+    'inelastic': InelasticIntensity,
+    'elastic': ElasticIntensity,
+    'intensity': Intensity,
+    'doppler': DopplerBroadenedSpectrum,
+    'temperature': ElasticInelasticTemperatureIntensity,
+}
+# swept inputs of the graphs and their default values
+SWEPT_PARAMETERS = {
+    'saturation_parameter': [1.0],
+    'detuning': [0.0],
+    'temperature': [100.0],
+    'angle': [90.0],
+    'laser_intensity_error_sigma': [0.0],
+}
+
+
+def parse_values(values: List[str]) -> List[float]:
+    """
+    :param values: list of numbers or a single start:stop:number
+    :return: values of the parameter
+    """
+    if len(values) == 1 and ':' in values[0]:
+        start, stop, number = values[0].split(':')
+        return np.linspace(float(start), float(stop), int(number)).tolist()
+    return [float(value) for value in values]
+
+
+def sweep_points(parameters: Dict[str, List[float]]) -> List[Dict[str, float]]:
+    """
+    :param parameters: values of each swept parameter
+    :return: cartesian product of the values (one dictionary of inputs per point)
+    """
+    names = list(parameters)
+    return [dict(zip(names, values)) for values in itertools.product(*(parameters[name] for name in names))]
+
+
+def compute_point(task: Tuple[str, Dict[str, Any], bool]) \
+        -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray], Optional[SpectralDelta], Optional[float]]:
+    """
+    computes one point of the sweep with a new graph
+    :param task: name of the graph, inputs of the graph, center the graph on the detuning
+    :return: x values, y values, standard error of the y values (None without Monte Carlo averaging), dirac of the
+    spectrum (None if it has no dirac), truncation error of the doppler kernel (None without doppler convolution)
+    """
+    graph_name, inputs, center_on_detuning = task
+    graph = GRAPHS[graph_name]()
+    parameters = GraphParameters(**inputs)
+    if center_on_detuning:
+        parameters = parameters.replace(offset=parameters.detuning)
+    if parameters.with_random:
+        graph.update_with_random(parameters)
+    else:
+        graph.update(parameters)
+    y_standard_error = None if graph.y_standard_error is None else np.asarray(graph.y_standard_error, dtype=float)
+    return np.asarray(graph.x_values, dtype=float), np.asarray(graph.y_values, dtype=float), y_standard_error, \
+        graph.spectral_delta, getattr(graph, 'truncation_error', None)
+
+
+def store_point(task: Tuple[str, Dict[str, Any], bool, str, int]) -> int:
+    """
+    computes one point of the sweep and writes it in its row of a store
+    :param task: name of the graph, inputs of the graph, center the graph on the detuning, directory of the store, row
+    :return: number of points of the spectrum
+    """
+    graph_name, inputs, center_on_detuning, path, row = task
+    x_values, y_values, y_standard_error, spectral_delta, truncation_error = \
+        compute_point((graph_name, inputs, center_on_detuning))
+    SpectrumStore(path, 'r+').write(row, inputs, x_values, y_values, y_standard_error, spectral_delta,
+                                    truncation_error)
+    return len(x_values)
+
+
+def store_columns(graph_name: str, settings: Dict[str, Any]) -> int:
+    """
+    :param graph_name: key of GRAPHS
+    :param settings: inputs shared by all the points
+    :return: maximum number of points of a spectrum of the sweep (resolution and the points added to the grid)
+    """
+    if GRAPHS[graph_name] is ElasticInelasticTemperatureIntensity:
+        resolution = settings.get('temperature_resolution', DEFAULTS['temperature_resolution'])
+    else:
+        resolution = settings.get('resolution', DEFAULTS['resolution'])
+    return int(resolution) + 8
+
+
+def run_sweep(graph_name: str, parameters: Dict[str, List[float]], settings: Dict[str, Any],
+              center_on_detuning: bool = False, processes: Optional[int] = None, chunk_size: int = 16,
+              store_path: Optional[str] = None) -> Tuple[List[Dict[str, float]], List[Any]]:
+    """
+    computes a graph on every point of a sweep
+    :param graph_name: key of GRAPHS
+    :param parameters: values of each swept parameter
+    :param settings: inputs shared by all the points (span, resolution, gamma...)
+    :param center_on_detuning: the offset of each point is its detuning
+    :param processes: number of processes (default: number of cores)
+    :param chunk_size: number of points sent to a process at once
+    :param store_path: directory of a SpectrumStore written by the processes (row i is point i)
+    :return: points, results of compute_point (lengths of the spectra with a store) in the same order as the points
+    """
+    points = sweep_points(parameters)
+    tasks = [(graph_name, dict(settings, **point), center_on_detuning) for point in points]
+    if 'laser_intensity_error_seed' in settings:
+        # every point gets its own realisations of the intensity error, reproducible from the seed
+        for index, (_, inputs, _) in enumerate(tasks):
+            inputs['laser_intensity_error_seed'] = settings['laser_intensity_error_seed'] + index
+    function = compute_point
+    if store_path is not None:
+        SpectrumStore.create(store_path, parameters, len(points), store_columns(graph_name, settings))
+        tasks = [task + (store_path, row) for row, task in enumerate(tasks)]
+        function = store_point
+    if processes == 1:
+        results = [function(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            results = list(executor.map(function, tasks, chunksize=chunk_size))
+    if store_path is not None:
+        SpectrumStore(store_path, 'r+').flush()
+    return points, results
+
+
+def save_sweep(path: str, points: List[Dict[str, float]],
+               results: List[Tuple[np.ndarray, np.ndarray, Any, Any, Any]]) -> None:
+    """
+    writes a sweep to a npz file: 'parameters' (structured array, one row per point), the x values, y values and
+    standard errors of all the points concatenated ('x_values', 'y_values', 'y_standard_error', nan without Monte
+    Carlo averaging), 'offsets' (the values of point i are [offsets[i]:offsets[i + 1]]), the dirac of each point
+    ('delta_position', 'delta_weight', nan if the spectrum has no dirac) and the truncation error of the doppler kernel
+    of each point ('truncation_error', nan without doppler convolution)
+    :param path: path of the file
+    :param points: points of the sweep
+    :param results: results of compute_point
+    """
+    names = list(points[0]) if points else []
+    parameters = np.array([tuple(point[name] for name in names) for point in points],
+                          dtype=[(name, float) for name in names])
+    lengths = [len(x_values) for x_values, *_ in results]
+    offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+    x_values = np.concatenate([x for x, *_ in results]) if results else np.zeros(0)
+    y_values = np.concatenate([y for _, y, *_ in results]) if results else np.zeros(0)
+    y_standard_error = np.concatenate([np.full(len(x), np.nan) if error is None else error
+                                       for x, _, error, *_ in results]) if results else np.zeros(0)
+    deltas = np.array([delta_values(delta) for _, _, _, delta, _ in results], dtype=float).reshape(-1, 2)
+    truncation_errors = np.array([np.nan if error is None else error for *_, error in results], dtype=float)
+    np.savez(path, parameters=parameters, offsets=offsets, x_values=x_values, y_values=y_values,
+             y_standard_error=y_standard_error, delta_position=deltas[:, 0], delta_weight=deltas[:, 1],
+             truncation_error=truncation_errors)
+
+
+def main(arguments=None) -> None:
+    """
+    command line entry point
+    :param arguments: command line arguments (default: sys.argv)
+    """
+    parser = argparse.ArgumentParser(description='computes a graph over a grid of parameters without the interface')
+    parser.add_argument('--graph', choices=sorted(GRAPHS), default='intensity')
+    for name, default in SWEPT_PARAMETERS.items():
+        parser.add_argument('--' + name.replace('_', '-'), nargs='+', default=[str(value) for value in default],
+                            help='values or start:stop:number')
+    parser.add_argument('--laser-intensity-error-mu', type=float, default=0.0)
+    parser.add_argument('--laser-intensity-error-uniform', type=float, default=0.0)
+    parser.add_argument('--laser-intensity-error-random-resolution', type=int, default=30)
+    parser.add_argument('--laser-intensity-error-averaging', choices=['monte_carlo', 'quadrature'],
+                        default='monte_carlo')
+    parser.add_argument('--laser-intensity-error-seed', type=int, default=None)
+    parser.add_argument('--gamma', type=float, default=1.0)
+    parser.add_argument('--saturation-intensity', type=float, default=1.669)
+    parser.add_argument('--span', type=float, default=10.0)
+    parser.add_argument('--resolution', type=int, default=2000)
+    parser.add_argument('--offset', type=float, default=0.0)
+    parser.add_argument('--center-on-detuning', action='store_true')
+    parser.add_argument('--convolution-method', choices=['fft', 'analytic'], default='fft')
+    parser.add_argument('--processes', type=int, default=os.cpu_count())
+    parser.add_argument('--output', default='sweep.npz')
+    parser.add_argument('--store', default=None, help='directory of a memory-mapped store (replaces --output)')
+    arguments = parser.parse_args(arguments)
+
+    parameters = {name: parse_values(getattr(arguments, name)) for name in SWEPT_PARAMETERS}
+    settings = {name: getattr(arguments, name) for name in (
+        'laser_intensity_error_mu', 'laser_intensity_error_uniform', 'laser_intensity_error_random_resolution',
+        'laser_intensity_error_averaging', 'gamma', 'saturation_intensity', 'span', 'resolution', 'offset',
+        'convolution_method')}
+    if arguments.laser_intensity_error_seed is not None:
+        settings['laser_intensity_error_seed'] = arguments.laser_intensity_error_seed
+
+    start = time.perf_counter()
+    points, results = run_sweep(arguments.graph, parameters, settings, arguments.center_on_detuning,
+                                arguments.processes, store_path=arguments.store)
+    if arguments.store is None:
+        save_sweep(arguments.output, points, results)
+    output = arguments.output if arguments.store is None else arguments.store
+    print(f'{len(points)} points computed in {time.perf_counter() - start:.2f}s, saved to {output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+colors of the qt_material themes, compiled once per theme file to a small JSON file (themes/.cache/<theme>.json) which
+is compiled again when the theme file is modified
+"""
+from typing import Dict
+from xml.etree import ElementTree
+import json
+import os
+
+CACHE_DIRECTORY = os.path.join('themes', '.cache')
+
+
+def parse_theme(path: str) -> Dict[str, str]:
+    """
+    reads the colors of a theme file
+    :param path: theme file (xml)
+    :return: dictionary name of the color -> color
+    """
+    return {color.get('name'): color.text.strip() for color in ElementTree.parse(path).getroot().iter('color')}
+
+
+def theme_colors(theme: str, themes_directory: str = 'themes',
+                 cache_directory: str = CACHE_DIRECTORY) -> Dict[str, str]:
+    """
+    colors of a theme, read from the compiled cache if it is newer than the theme file
+    :param theme: name of the theme (file <themes_directory>/<theme>.xml)
+    :param themes_directory: directory of the theme files
+    :param cache_directory: directory of the compiled themes
+    :return: dictionary name of the color -> color
+    """
+    path = os.path.join(themes_directory, theme + '.xml')
+    cache_path = os.path.join(cache_directory, theme + '.json')
+    mtime = os.path.getmtime(path)
+    try:
+        with open(cache_path, 'r') as f:
+            cache = json.load(f)
+        if cache['mtime'] == mtime:
+            return cache['colors']
+    except (OSError, ValueError, KeyError):
+        pass
+
+    colors = parse_theme(path)
+    try:
+        os.makedirs(cache_directory, exist_ok=True)
+        with open(cache_path, 'w') as f:
+            json.dump({'mtime': mtime, 'colors': colors}, f, indent=2)
+    except OSError:
+        # read-only installation: the theme is parsed on every launch
+        pass
+    return colors
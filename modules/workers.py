@@ -0,0 +1,92 @@
+"""
+computation of the graphs outside of the Qt GUI thread
+"""
+from typing import Any, List, Optional
+import numpy as np
+from PyQt5 import QtCore
+from modules.result_cache import ResultCache
+from modules.spectral_delta import SpectralDelta
+from modules.parameters import GraphParameters
+
+
+class GraphResult:
+    """copy of the values of a graph, safe to draw while the graph is computed again"""
+
+    def __init__(self, graph):
+        """
+        :param graph: updated graph (NumbersGraph)
+        """
+        self.name = graph.name
+        self.color = graph.color
+        self.x_values = np.array(graph.x_values, dtype=float)
+        self.y_values = np.array(graph.y_values, dtype=float)
+        self.y_standard_error = None if graph.y_standard_error is None else np.array(graph.y_standard_error)
+        delta = graph.spectral_delta
+        self.spectral_delta = None if delta is None else SpectralDelta(delta.position, delta.weight)
+        # part of the doppler kernel removed by its truncation (None for the graphs without doppler convolution)
+        self.truncation_error = getattr(graph, 'truncation_error', None)
+
+    @property
+    def nbytes(self) -> int:
+        """size in bytes of the arrays of the result"""
+        return self.x_values.nbytes + self.y_values.nbytes + \
+            (0 if self.y_standard_error is None else self.y_standard_error.nbytes)
+
+
+class GraphWorkerSignals(QtCore.QObject):
+    """signals of GraphWorker (a QRunnable can not emit signals itself)"""
+    # generation of the job, results (List[GraphResult]), parameters used for the computation
+    finished = QtCore.pyqtSignal(int, object, object)
+
+
+class GraphWorker(QtCore.QRunnable):
+    """updates a list of graphs in a thread of a QThreadPool"""
+
+    def __init__(self, generation: int, graphs: List[Any], parameters: GraphParameters, with_random: bool,
+                 cache: Optional[ResultCache] = None):
+        """
+        :param generation: number of the job, results of older jobs are ignored
+        :param graphs: graphs to update
+        :param parameters: parameters of the graphs (immutable, shared with the GUI thread)
+        :param with_random: update the graphs with the intensity error
+        :param cache: results of previous jobs, graphs already computed with the same inputs are not computed again
+        """
+        super().__init__()
+        self.generation = generation
+        self.graphs = list(graphs)
+        self.parameters = parameters
+        self.with_random = with_random
+        self.cache = cache
+        self.cancelled = False
+        self.signals = GraphWorkerSignals()
+
+    def cancel(self) -> None:
+        """the job stops before its next graph and does not emit its results"""
+        self.cancelled = True
+
+    def run(self) -> None:
+        """
+        updates the graphs
+        """
+        results = []
+        for graph in self.graphs:
+            if self.cancelled:
+                return
+            key = None if self.cache is None else self.cache.key(graph, self.parameters, self.with_random)
+            result = None if self.cache is None else self.cache.get(key)
+            if result is not None:
+                results.append(result)
+                continue
+            try:
+                if self.with_random:
+                    graph.update_with_random(self.parameters)
+                else:
+                    graph.update(self.parameters)
+                result = GraphResult(graph)
+                results.append(result)
+                if self.cache is not None:
+                    self.cache.put(key, result)
+            except IndexError as e:
+                print(e)
+        if not self.cancelled:
+            self.signals.finished.emit(self.generation, results, self.parameters)